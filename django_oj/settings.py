@@ -7,6 +7,19 @@ enables the Django admin, and includes standard middleware.  For a
 production deployment you would want to adjust settings such as
 ``SECRET_KEY``, ``DEBUG``, allowed hosts, and database configuration.
 
+Setting ``DJANGO_PROFILE=production`` switches to a profile tuned for
+many concurrent judges: debug off, ``DJANGO_SECRET_KEY`` and
+``DJANGO_ALLOWED_HOSTS`` required from the environment, and SQLite in WAL
+mode with a busy timeout (see ``SQLITE_PRAGMAS`` and ``judge/signals.py``).
+Setting ``POSTGRES_DB`` (plus ``POSTGRES_USER``, ``POSTGRES_PASSWORD``,
+``POSTGRES_HOST``, ``POSTGRES_PORT``) uses PostgreSQL instead of SQLite,
+with a psycopg connection pool when ``psycopg_pool`` is installed.
+
+The views are served over ASGI, where each request's database work runs
+in a fresh thread, so persistent connections (``CONN_MAX_AGE``) would
+never be reused and default to off; ``DJANGO_CONN_MAX_AGE`` re-enables
+them for WSGI deployments.
+
 Because this repository does not install Django, this file is
 illustrative and will not execute in the current environment.  It is
 provided to demonstrate how you can configure a Django project for
@@ -15,19 +28,29 @@ running coding challenges with a CodeMirror‑powered editor.
 
 from __future__ import annotations
 
+import importlib.util
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured  # type: ignore
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+PROFILE = os.environ.get('DJANGO_PROFILE', 'development')
+PRODUCTION = PROFILE == 'production'
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-change-this-key'
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '' if PRODUCTION else 'django-insecure-change-this-key')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('DJANGO_SECRET_KEY must be set when DJANGO_PROFILE=production.')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
-ALLOWED_HOSTS: list[str] = []
+ALLOWED_HOSTS: list[str] = [h for h in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if h]
+if PRODUCTION and not ALLOWED_HOSTS:
+    raise ImproperlyConfigured('DJANGO_ALLOWED_HOSTS must be set when DJANGO_PROFILE=production.')
 
 # Application definition
 INSTALLED_APPS = [
@@ -73,11 +96,51 @@ WSGI_APPLICATION = 'django_oj.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+CONN_MAX_AGE = int(os.environ.get('DJANGO_CONN_MAX_AGE', '0'))
+
+if os.environ.get('POSTGRES_DB'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['POSTGRES_DB'],
+            'USER': os.environ.get('POSTGRES_USER', ''),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
+    # Reuse connections across requests (and ASGI threads) through a
+    # pool; Django requires CONN_MAX_AGE = 0 with it.
+    if CONN_MAX_AGE == 0 and importlib.util.find_spec('psycopg_pool') is not None:
+        DATABASES['default']['OPTIONS'] = {'pool': True}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'OPTIONS': {
+                # Seconds to wait for a lock before "database is locked".
+                'timeout': 20,
+                # Take the write lock when a transaction starts, so two
+                # writers queue on busy_timeout instead of one failing
+                # when it tries to upgrade a read lock.
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# PRAGMAs run on every new SQLite connection (judge/signals.py).  WAL lets
+# readers proceed while a judge is writing; synchronous=NORMAL is safe in
+# WAL mode and avoids an fsync per commit.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+} if PRODUCTION else {
+    'busy_timeout': 20000,
 }
 
 # Password validation
@@ -118,4 +181,61 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = 'login'  # resolves from django.contrib.auth.urls
 LOGIN_REDIRECT_URL = 'problem_list'
-LOGOUT_REDIRECT_URL = 'problem_list'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'problem_list'
+
+# Sandbox used to run submissions (see judge/sandbox.py).  Each run gets
+# its own cgroup v2 group under ``cgroup_root`` when the judge user has
+# been delegated that subtree; otherwise setrlimit limits are used.
+JUDGE_SANDBOX = {
+    'use_cgroups': True,
+    'cgroup_root': os.environ.get('JUDGE_CGROUP_ROOT', '/sys/fs/cgroup/pythonforce'),
+    # When the judge runs as root, each run gets its own uid/gid from this
+    # range (keep it larger than the number of concurrent runs).
+    'uid_range': (60000, 61000),
+    'limits': {
+        'cpu_time': 2.0,
+        'wall_time': 5.0,
+        'memory': 256 * 1024 * 1024,
+        'pids': 16,
+        'output': 1024 * 1024,
+        'cpu_quota': 1.0,
+    },
+}
+
+# Per-test results are stored compactly (judge/results.py).  Actual output
+# and stderr are truncated to this many characters, and can optionally be
+# zlib-compressed inside the JSON.
+JUDGE_RESULTS_TEXT_LIMIT = 1024
+JUDGE_RESULTS_COMPRESS = False
+
+# Where ``manage.py archive_submissions`` writes compressed archives of
+# submissions that fall outside the retention policy.
+JUDGE_ARCHIVE_DIR = Path(os.environ.get('JUDGE_ARCHIVE_DIR', BASE_DIR / 'archive'))
+
+# Static checks run before a submission is executed (judge/precheck.py).
+# Each entry is a dotted path to ``check(tree, problem, test_cases)``.
+JUDGE_PRECHECKS = [
+    'judge.precheck.check_forbidden_imports',
+    'judge.precheck.check_reads_input',
+]
+JUDGE_PRECHECK_CACHE_TIMEOUT = 3600
+# Longer submissions are rejected before being parsed in the web process.
+JUDGE_PRECHECK_MAX_CODE_SIZE = 64 * 1024
+
+# Per-runtime options for judge/runners.py.  ``time_multiplier`` scales the
+# sandbox time limits for every problem using that runtime.
+JUDGE_RUNNERS = {
+    'python3': {'time_multiplier': 1.0},
+    'pypy3': {'time_multiplier': 1.0},
+    'python3-warm': {'time_multiplier': 1.0, 'pool_size': 2},
+}
+# Capacity of each pipe between an interactor and a submission.
+JUDGE_INTERACTIVE_PIPE_BUFFER = 64 * 1024
+
+# Opt-in sampling profiles of failing submissions (judge/profiling.py).
+JUDGE_PROFILING = {
+    'interval': 0.005,  # CPU seconds between samples
+    'budget': 2.0,      # CPU seconds profiled at most
+    'top': 10,          # hot functions / lines kept
+    'workers': 1,       # background profiling threads per process
+}
@@ -1,22 +1,47 @@
 """
 Django admin configuration for the judge app.
 
-This file registers the ``Problem``, ``TestCase``, and ``Submission``
-models with the admin site so they can be managed through the
-Django administration interface.
+This file registers the ``Problem``, ``TestCase``, ``Submission`` and
+``Solution`` models with the admin site so they can be managed through
+the Django administration interface.  Problem and solution pages also
+show the most similar solutions from the plagiarism index.
 """
 
 from __future__ import annotations
 
 from django.contrib import admin  # type: ignore
+from django.urls import reverse  # type: ignore
+from django.utils.html import format_html_join  # type: ignore
 
-from .models import Problem, TestCase, Submission
+from . import similarity
+from .models import Problem, TestCase, Submission, Solution
+
+SIMILAR_LIMIT = 10
+
+
+def _solution_link(solution_id: int) -> str:
+    return reverse('admin:judge_solution_change', args=[solution_id])
 
 
 @admin.register(Problem)
 class ProblemAdmin(admin.ModelAdmin):
     list_display = ('title',)
     search_fields = ('title',)
+    readonly_fields = ('similar_solution_pairs',)
+
+    def similar_solution_pairs(self, obj: Problem) -> str:
+        if obj.pk is None:
+            return '-'
+        pairs = similarity.similar_pairs(obj, SIMILAR_LIMIT)
+        if not pairs:
+            return 'No similar solutions found.'
+        return format_html_join(
+            '\n', '<div><a href="{}">#{}</a> ~ <a href="{}">#{}</a>: {}% ({} shared)</div>',
+            ((_solution_link(p['pair'][0]), p['pair'][0], _solution_link(p['pair'][1]), p['pair'][1],
+              round(p['score'] * 100), p['shared']) for p in pairs),
+        )
+
+    similar_solution_pairs.short_description = 'Most similar solution pairs'
 
 
 @admin.register(TestCase)
@@ -39,4 +64,37 @@ class TestCaseAdmin(admin.ModelAdmin):
 class SubmissionAdmin(admin.ModelAdmin):
     list_display = ('id', 'problem', 'created_at', 'passed')
     list_filter = ('problem', 'passed')
-    readonly_fields = ('created_at', 'output', 'error')
\ No newline at end of file
+    readonly_fields = ('created_at', 'output', 'error', 'test_results_summary')
+    exclude = ('per_test_results',)
+
+    def test_results_summary(self, obj: Submission) -> str:
+        rows = obj.test_results()
+        if not rows:
+            return '-'
+        return format_html_join(
+            '\n', '<div>Test {}: {} ({})</div>',
+            ((r['index'], r['verdict_label'], r['stderr'] or r['actual'][:50]) for r in rows),
+        )
+
+    test_results_summary.short_description = 'Per-test results'
+
+
+@admin.register(Solution)
+class SolutionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'problem', 'created_at')
+    list_filter = ('problem',)
+    readonly_fields = ('created_at', 'similar_solutions')
+
+    def similar_solutions(self, obj: Solution) -> str:
+        if obj.pk is None:
+            return '-'
+        matches = similarity.similar_to(obj, SIMILAR_LIMIT)
+        if not matches:
+            return 'No similar solutions found.'
+        return format_html_join(
+            '\n', '<div><a href="{}">Solution #{}</a>: {}% ({} shared)</div>',
+            ((_solution_link(m['solution_id']), m['solution_id'], round(m['score'] * 100), m['shared'])
+             for m in matches),
+        )
+
+    similar_solutions.short_description = 'Similar solutions'
@@ -10,4 +10,7 @@ from django.apps import AppConfig  # type: ignore
 class JudgeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'judge'
-    verbose_name = 'Online Judge'
\ No newline at end of file
+    verbose_name = 'Online Judge'
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401  (connects receivers)
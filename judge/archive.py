@@ -0,0 +1,218 @@
+"""
+Archival of old ``Submission`` rows to compressed JSONL files.
+
+The retention policy (see ``manage.py archive_submissions``) keeps, for
+every (user, problem) pair, the latest submission and the latest passing
+one, plus every submission referenced by a ``Solution``.  Everything
+else can be moved to archive files and restored later with
+``manage.py restore_submissions``.
+
+Archive files hold one JSON object per submission.  They are written
+with zstandard (``.jsonl.zst``) when the optional ``zstandard`` package
+is installed and with gzip (``.jsonl.gz``) otherwise; both are read
+back transparently.  A submission's ``SubmissionProfile``, if any, is
+stored with it under ``"profile"`` and restored with it.
+``UserProblemStat`` is never touched, so attempt counts and acceptance
+times survive archiving.
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Optional
+
+from django.conf import settings  # type: ignore
+from django.db import transaction  # type: ignore
+from django.utils.dateparse import parse_datetime  # type: ignore
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+from .models import Solution, Submission, SubmissionProfile
+
+
+ARCHIVED_FIELDS = (
+    'id', 'user_id', 'problem_id', 'code', 'created_at',
+    'passed', 'output', 'error', 'per_test_results',
+)
+PROFILE_FIELDS = ('test_case_id', 'status', 'data', 'message', 'created_at')
+
+
+def archive_dir() -> Path:
+    return Path(getattr(settings, 'JUDGE_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archive'))
+
+
+def archive_suffix() -> str:
+    return '.jsonl.zst' if zstandard is not None else '.jsonl.gz'
+
+
+def _open_write(path: Path) -> IO[bytes]:
+    if path.name.endswith('.zst'):
+        return zstandard.ZstdCompressor(level=10).stream_writer(open(path, 'wb'), closefd=True)
+    return gzip.open(path, 'wb', compresslevel=6)
+
+
+def _open_read(path: Path) -> IO[bytes]:
+    if path.name.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f'{path} is zstd-compressed but zstandard is not installed.')
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return gzip.open(path, 'rb')
+
+
+def select_archivable(cutoff=None) -> array:
+    """Return ids of submissions that the retention policy does not keep.
+
+    Only ids are loaded (never code or results), ordered so that each
+    (user, problem) group is seen newest-first.  ``cutoff`` restricts the
+    result to submissions created before that datetime.
+    """
+    keep_ids = set(Solution.objects.values_list('submission_id', flat=True))
+    archivable = array('q')
+    rows = (
+        Submission.objects
+        .order_by('user_id', 'problem_id', '-created_at', '-id')
+        .values_list('id', 'user_id', 'problem_id', 'passed', 'created_at')
+    )
+    group = None
+    seen_latest = seen_passed = False
+    for sub_id, user_id, problem_id, passed, created_at in rows.iterator(chunk_size=2000):
+        if (user_id, problem_id) != group:
+            group = (user_id, problem_id)
+            seen_latest = seen_passed = False
+        keep = sub_id in keep_ids
+        if not seen_latest:
+            seen_latest = keep = True
+        if passed and not seen_passed:
+            seen_passed = keep = True
+        if not keep and (cutoff is None or created_at < cutoff):
+            archivable.append(sub_id)
+    return archivable
+
+
+def _batches(ids: array, size: int) -> Iterator[List[int]]:
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size].tolist()
+
+
+def write_batch(path: Path, rows: Iterable[dict]) -> int:
+    """Write ``rows`` to ``path`` and fsync; returns the number written."""
+    count = 0
+    # Write under a hidden name first so a half-written file never looks
+    # like a complete archive.
+    tmp = path.with_name('.' + path.name)
+    with _open_write(tmp) as fh:
+        for row in rows:
+            row = dict(row)
+            row['created_at'] = row['created_at'].isoformat()
+            profile = row.get('profile')
+            if profile:
+                row['profile'] = dict(profile, created_at=profile['created_at'].isoformat())
+            fh.write(json.dumps(row, separators=(',', ':')).encode('utf-8') + b'\n')
+            count += 1
+    with open(tmp, 'rb') as fh:
+        os.fsync(fh.fileno())
+    tmp.rename(path)
+    return count
+
+
+def archive_submissions(ids: array, directory: Path, batch_size: int = 1000,
+                        prefix: str = 'submissions', dry_run: bool = False) -> int:
+    """Move the given submissions into archive files, ``batch_size`` per file.
+
+    Each batch is fully written and synced to disk before its rows are
+    deleted, so an interruption never loses data.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    moved = 0
+    for n, batch in enumerate(_batches(ids, batch_size), start=1):
+        if dry_run:
+            moved += len(batch)
+            continue
+        path = directory / f'{prefix}-{n:05d}{archive_suffix()}'
+        rows = Submission.objects.filter(id__in=batch).order_by('id').values(*ARCHIVED_FIELDS)
+        profiles = {p.pop('submission_id'): p for p in SubmissionProfile.objects
+                    .filter(submission_id__in=batch).values('submission_id', *PROFILE_FIELDS)}
+        written = write_batch(path, (dict(row, profile=profiles.get(row['id']))
+                                     for row in rows.iterator(chunk_size=batch_size)))
+        with transaction.atomic():
+            Submission.objects.filter(id__in=batch).delete()
+        moved += written
+    return moved
+
+
+def read_archive(path: Path) -> Iterator[dict]:
+    with _open_read(path) as raw:
+        for line in io.TextIOWrapper(raw, encoding='utf-8'):
+            if line.strip():
+                yield json.loads(line)
+
+
+def restore_archive(path: Path, ids: Optional[set] = None, batch_size: int = 1000) -> int:
+    """Re-insert submissions from ``path`` (optionally only ``ids``).
+
+    Rows whose id already exists, or whose user or problem has since been
+    deleted, are skipped.  Returns the number of restored rows.
+    """
+    from django.contrib.auth import get_user_model  # type: ignore
+    from .models import Problem, TestCase
+
+    user_ids = set(get_user_model().objects.values_list('id', flat=True))
+    problem_ids = set(Problem.objects.values_list('id', flat=True))
+    restored = 0
+    pending: List[Submission] = []
+    profiles: dict = {}
+
+    def flush() -> int:
+        existing = set(Submission.objects.filter(id__in=[s.id for s in pending])
+                       .values_list('id', flat=True))
+        objs = [s for s in pending if s.id not in existing]
+        created = {s.id: s.created_at for s in objs}
+        restored_profiles = [SubmissionProfile(submission_id=s.id, **profiles[s.id])
+                             for s in objs if s.id in profiles]
+        case_ids = {p.test_case_id for p in restored_profiles if p.test_case_id}
+        live_cases = set(TestCase.objects.filter(id__in=case_ids).values_list('id', flat=True))
+        for p in restored_profiles:
+            if p.test_case_id not in live_cases:
+                p.test_case_id = None
+        with transaction.atomic():
+            Submission.objects.bulk_create(objs)
+            SubmissionProfile.objects.bulk_create(restored_profiles)
+            # auto_now_add overwrote created_at on insert; put it back.
+            for s in objs:
+                s.created_at = created[s.id]
+            Submission.objects.bulk_update(objs, ['created_at'])
+            for p in restored_profiles:
+                p.created_at = profiles[p.submission_id]['created_at']
+            SubmissionProfile.objects.bulk_update(restored_profiles, ['created_at'])
+        pending.clear()
+        profiles.clear()
+        return len(objs)
+
+    for row in read_archive(path):
+        if ids is not None and row['id'] not in ids:
+            continue
+        if row['problem_id'] not in problem_ids:
+            continue
+        if row['user_id'] is not None and row['user_id'] not in user_ids:
+            continue
+        created_at = parse_datetime(row.pop('created_at'))
+        profile = row.pop('profile', None)
+        if profile:
+            profile['created_at'] = parse_datetime(profile['created_at'])
+            profiles[row['id']] = profile
+        sub = Submission(**row)
+        sub.created_at = created_at
+        pending.append(sub)
+        if len(pending) >= batch_size:
+            restored += flush()
+    if pending:
+        restored += flush()
+    return restored
@@ -0,0 +1,55 @@
+"""
+Apply the submission retention policy.
+
+For every (user, problem) pair the latest submission and the latest
+passing submission are kept, as is any submission referenced by a
+``Solution``.  All other submissions (optionally only those older than
+``--older-than`` days) are written to compressed archive files in
+batches and then deleted.  See ``judge.archive`` for the file format.
+
+Usage::
+
+    python manage.py archive_submissions --older-than 90 --dry-run
+    python manage.py archive_submissions --older-than 90 --batch-size 5000
+"""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand  # type: ignore
+from django.utils import timezone
+
+from judge import archive
+
+
+class Command(BaseCommand):
+    help = 'Move submissions outside the retention policy into compressed archive files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=None, metavar='DAYS',
+                            help='Only archive submissions older than this many days.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Submissions per archive file / delete transaction.')
+        parser.add_argument('--dir', dest='directory', default=None,
+                            help='Archive directory (default: settings.JUDGE_ARCHIVE_DIR).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report how many submissions would be archived.')
+
+    def handle(self, *args, **options):
+        cutoff = None
+        if options['older_than'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['older_than'])
+        directory = Path(options['directory']) if options['directory'] else archive.archive_dir()
+
+        ids = archive.select_archivable(cutoff)
+        prefix = 'submissions-' + timezone.now().strftime('%Y%m%dT%H%M%S')
+        moved = archive.archive_submissions(
+            ids, directory, batch_size=options['batch_size'],
+            prefix=prefix, dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{moved} submissions would be archived.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Archived {moved} submissions to {directory}.'))
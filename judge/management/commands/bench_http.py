@@ -0,0 +1,148 @@
+"""
+Compare request throughput of the WSGI and ASGI entry points.
+
+Both applications are driven in-process, so the numbers measure Django's
+request handling (middleware, views, ORM, templates) rather than any
+particular web server.  WSGI requests are issued from a thread pool, the
+way a threaded WSGI server would; ASGI requests are issued as concurrent
+tasks on one event loop, the way uvicorn/daphne would.
+
+Usage::
+
+    python manage.py bench_http --requests 500 --concurrency 32
+    python manage.py bench_http --path /leaderboard/ --path /problems/1/
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from django.core.management.base import BaseCommand  # type: ignore
+
+
+DEFAULT_PATHS = ['/', '/leaderboard/']
+HOST = '127.0.0.1'
+
+
+def _wsgi_request(application, path: str) -> int:
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'HTTP_HOST': HOST,
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(b''),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    status: List[str] = []
+
+    def start_response(s, headers, exc_info=None):
+        status.append(s)
+
+    body = application(environ, start_response)
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return int(status[0].split()[0])
+
+
+async def _asgi_request(application, path: str) -> int:
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'headers': [(b'host', HOST.encode())],
+        'client': (HOST, 50000),
+        'server': (HOST, 80),
+    }
+    status: List[int] = []
+    body_sent = asyncio.Event()
+    disconnected = asyncio.Event()
+
+    async def receive():
+        if not body_sent.is_set():
+            body_sent.set()
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Django listens for a disconnect while the view runs; the client
+        # stays connected until the handler finishes and cancels this.
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark WSGI vs ASGI request throughput for the read-only views.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300,
+                            help='Requests per path and interface.')
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help='Concurrent in-flight requests.')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='URL path to request (repeatable).')
+
+    def handle(self, *args, **options):
+        from django.core.asgi import get_asgi_application  # type: ignore
+        from django.core.wsgi import get_wsgi_application  # type: ignore
+
+        paths = options['paths'] or DEFAULT_PATHS
+        n = options['requests']
+        concurrency = options['concurrency']
+        wsgi_app = get_wsgi_application()
+        asgi_app = get_asgi_application()
+
+        self.stdout.write(f'{"path":<24}{"interface":<10}{"req/s":>10}{"errors":>8}')
+        for path in paths:
+            for name, runner in (('wsgi', self._run_wsgi), ('asgi', self._run_asgi)):
+                app = wsgi_app if name == 'wsgi' else asgi_app
+                runner(app, path, min(n, 10), concurrency)  # warm up
+                elapsed, statuses = runner(app, path, n, concurrency)
+                errors = sum(1 for s in statuses if s >= 400)
+                self.stdout.write(f'{path:<24}{name:<10}{n / elapsed:>10.1f}{errors:>8}')
+
+    @staticmethod
+    def _run_wsgi(app, path: str, n: int, concurrency: int) -> Tuple[float, List[int]]:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            statuses = list(pool.map(lambda _: _wsgi_request(app, path), range(n)))
+        return time.perf_counter() - started, statuses
+
+    @staticmethod
+    def _run_asgi(app, path: str, n: int, concurrency: int) -> Tuple[float, List[int]]:
+        async def main() -> List[int]:
+            limit = asyncio.Semaphore(concurrency)
+
+            async def one() -> int:
+                async with limit:
+                    return await _asgi_request(app, path)
+
+            return await asyncio.gather(*(one() for _ in range(n)))
+
+        started = time.perf_counter()
+        statuses = asyncio.run(main())
+        return time.perf_counter() - started, statuses
@@ -0,0 +1,30 @@
+"""
+Rebuild the solution similarity index from scratch.
+
+Fingerprinting runs in a process pool, one worker per core by default.
+
+Usage::
+
+    python manage.py rebuild_similarity_index
+    python manage.py rebuild_similarity_index --problem 3 --workers 4
+"""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand  # type: ignore
+
+from judge import similarity
+
+
+class Command(BaseCommand):
+    help = 'Recompute winnowing fingerprints for all solutions in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problem', type=int, default=None,
+                            help='Only rebuild the index for this problem id.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: number of CPUs).')
+
+    def handle(self, *args, **options):
+        count = similarity.rebuild(problem_id=options['problem'], workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} solutions.'))
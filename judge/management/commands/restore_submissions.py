@@ -0,0 +1,37 @@
+"""
+Restore archived submissions written by ``archive_submissions``.
+
+Usage::
+
+    python manage.py restore_submissions archive/submissions-20250101T000000-00001.jsonl.zst
+    python manage.py restore_submissions archive/*.jsonl.zst --id 42 --id 43
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError  # type: ignore
+
+from judge import archive
+
+
+class Command(BaseCommand):
+    help = 'Re-insert submissions from archive files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Archive files to restore from.')
+        parser.add_argument('--id', type=int, action='append', dest='ids',
+                            help='Only restore this submission id (repeatable).')
+
+    def handle(self, *args, **options):
+        ids = set(options['ids']) if options['ids'] else None
+        total = 0
+        for name in options['files']:
+            path = Path(name)
+            if not path.exists():
+                raise CommandError(f'{path} does not exist.')
+            restored = archive.restore_archive(path, ids=ids)
+            self.stdout.write(f'{path}: restored {restored} submissions.')
+            total += restored
+        self.stdout.write(self.style.SUCCESS(f'Restored {total} submissions.'))
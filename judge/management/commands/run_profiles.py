@@ -0,0 +1,29 @@
+"""
+Compute profiles that are still pending.
+
+Profiles are normally computed on a background thread of the web
+process that received the request; this command finishes any that were
+interrupted, for example by a restart.
+
+Usage::
+
+    python manage.py run_profiles
+"""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand  # type: ignore
+
+from judge import profiling
+from judge.models import SubmissionProfile
+
+
+class Command(BaseCommand):
+    help = 'Run the profiler for all pending submission profiles.'
+
+    def handle(self, *args, **options):
+        ids = list(SubmissionProfile.objects.filter(status=SubmissionProfile.PENDING)
+                   .order_by('id').values_list('id', flat=True))
+        for profile_id in ids:
+            profiling.run_profile(profile_id)
+        self.stdout.write(self.style.SUCCESS(f'Processed {len(ids)} pending profiles.'))
@@ -0,0 +1,111 @@
+"""
+Stress the concurrent submission write path.
+
+Many threads call ``judge.views.record_submission`` at once (the same
+function the submit view uses), each with its own database connection,
+and the command reports how many writes failed, e.g. with "database is
+locked".  The judging itself is skipped; only database contention is
+exercised.
+
+The run never touches the configured database.  It builds a throwaway
+test database with the same backend and settings (a temporary file for
+SQLite, ``test_<name>`` for PostgreSQL, which needs CREATEDB), migrates
+it, writes there and drops it afterwards.
+
+Usage::
+
+    python manage.py stress_submissions --threads 32 --per-thread 50
+    DJANGO_PROFILE=production DJANGO_SECRET_KEY=x DJANGO_ALLOWED_HOSTS=localhost \
+        python manage.py stress_submissions
+"""
+
+from __future__ import annotations
+
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model  # type: ignore
+from django.core.management.base import BaseCommand, CommandError  # type: ignore
+from django.db import OperationalError, connection, connections  # type: ignore
+from django.test.utils import setup_databases, teardown_databases  # type: ignore
+
+from judge.models import Problem, UserProblemStat
+from judge.views import record_submission
+
+USER_PREFIX = 'stress-'
+
+
+class Command(BaseCommand):
+    help = 'Hammer the submission write path from many threads and report failures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--per-thread', type=int, default=25)
+        parser.add_argument('--users', type=int, default=4,
+                            help='Distinct users; fewer users means more contention on stats rows.')
+
+    def handle(self, *args, **options):
+        tmpdir = tempfile.mkdtemp(prefix='judge-stress-')
+        if connection.vendor == 'sqlite':
+            # A file, not the in-memory default, so locking behaves as in
+            # production.
+            connection.settings_dict['TEST']['NAME'] = f'{tmpdir}/stress.sqlite3'
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            self._run(options)
+        finally:
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def _run(self, options):
+        problem = Problem.objects.create(title='Stress test', description='')
+
+        User = get_user_model()
+        users = [User.objects.create(username=f'{USER_PREFIX}{i}') for i in range(options['users'])]
+        per_thread = options['per_thread']
+        errors: Counter = Counter()
+        lock = threading.Lock()
+        start = threading.Barrier(options['threads'])
+
+        def worker(n: int) -> None:
+            user = users[n % len(users)]
+            start.wait()
+            try:
+                for i in range(per_thread):
+                    try:
+                        record_submission(
+                            user, problem, f'print({n}, {i})', i % 5 == 0,
+                            [f'#1 -> {n} {i}'], [],
+                        )
+                    except OperationalError as exc:
+                        with lock:
+                            errors[str(exc)] += 1
+            finally:
+                connections.close_all()
+
+        self.stdout.write(f'Backend: {connection.vendor}, '
+                          f'{options["threads"]} threads x {per_thread} submissions')
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(options['threads'])]
+        began = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - began
+
+        total = options['threads'] * per_thread
+        failed = sum(errors.values())
+        attempts = sum(UserProblemStat.objects.filter(user__in=users, problem=problem)
+                       .values_list('attempts', flat=True))
+
+        self.stdout.write(f'{total - failed}/{total} submissions stored in {elapsed:.2f}s '
+                          f'({total / elapsed:.0f}/s); stats counted {attempts} attempts.')
+        for message, count in errors.most_common():
+            self.stdout.write(f'  {count} x {message}')
+        if failed or attempts != total:
+            raise CommandError('Concurrent submission path lost or failed writes.')
+        self.stdout.write(self.style.SUCCESS('No failed writes.'))
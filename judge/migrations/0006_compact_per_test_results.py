@@ -0,0 +1,73 @@
+from django.db import migrations
+
+from judge import results
+
+
+def _cases_by_problem(TestCase):
+    cases = {}
+    for case in TestCase.objects.order_by('id').only('id', 'problem_id', 'input_data', 'expected_output'):
+        cases.setdefault(case.problem_id, []).append(case)
+    return cases
+
+
+def compact_results(apps, schema_editor):
+    # Results whose copied tests no longer match the current test cases
+    # are left in the old format rather than pointed at the wrong case.
+    Submission = apps.get_model('judge', 'Submission')
+    TestCase = apps.get_model('judge', 'TestCase')
+    cases = _cases_by_problem(TestCase)
+
+    batch = []
+    for sub in Submission.objects.only('id', 'problem_id', 'per_test_results').iterator(chunk_size=500):
+        if results.is_compact(sub.per_test_results) or not sub.per_test_results:
+            continue
+        compact = results.from_legacy(sub.per_test_results, cases.get(sub.problem_id, []))
+        if compact is None:
+            continue
+        sub.per_test_results = compact
+        batch.append(sub)
+        if len(batch) >= 500:
+            Submission.objects.bulk_update(batch, ['per_test_results'])
+            batch = []
+    if batch:
+        Submission.objects.bulk_update(batch, ['per_test_results'])
+
+
+def expand_results(apps, schema_editor):
+    Submission = apps.get_model('judge', 'Submission')
+    TestCase = apps.get_model('judge', 'TestCase')
+    cases = TestCase.objects.in_bulk()
+
+    batch = []
+    for sub in Submission.objects.only('id', 'per_test_results').iterator(chunk_size=500):
+        if not results.is_compact(sub.per_test_results):
+            continue
+        sub.per_test_results = [
+            {
+                'index': row['index'],
+                'input': row['input'],
+                'expected': row['expected'],
+                'actual': row['actual'],
+                'passed': row['passed'],
+                'stderr': row['stderr'],
+                'returncode': row['returncode'],
+            }
+            for row in results.decode(sub.per_test_results, cases)
+        ]
+        batch.append(sub)
+        if len(batch) >= 500:
+            Submission.objects.bulk_update(batch, ['per_test_results'])
+            batch = []
+    if batch:
+        Submission.objects.bulk_update(batch, ['per_test_results'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("judge", "0005_alter_userproblemstat_unique_together"),
+    ]
+
+    operations = [
+        migrations.RunPython(compact_results, expand_results),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0006_compact_per_test_results'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolutionFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='judge.problem')),
+                ('solution', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint', to='judge.solution')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FingerprintPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.BigIntegerField()),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='judge.problem')),
+                ('solution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='judge.solution')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['problem', 'hash'], name='judge_finge_problem_008973_idx')],
+                'unique_together': {('solution', 'hash')},
+            },
+        ),
+    ]
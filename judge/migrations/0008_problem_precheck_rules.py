@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0007_solution_similarity_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='forbidden_imports',
+            field=models.CharField(blank=True, default='os subprocess socket shutil ctypes multiprocessing', help_text='Space- or comma-separated top-level modules submissions may not import.', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='requires_input',
+            field=models.BooleanField(default=True, help_text='Reject submissions that never read standard input (when tests provide input).'),
+        ),
+    ]
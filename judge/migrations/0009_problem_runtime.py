@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0008_problem_precheck_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='interactor',
+            field=models.TextField(blank=True, help_text='Python judge program for interactive problems.  It is run with the test input file as argv[1], talks to the submission over stdin/stdout and exits 0 to accept.'),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='language',
+            field=models.CharField(choices=[('auto', 'Fastest available'), ('python3', 'CPython 3'), ('pypy3', 'PyPy 3'), ('python3-warm', 'CPython 3 (warm pool)')], default='python3', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='time_multiplier',
+            field=models.FloatField(default=1.0, help_text='Scales the sandbox CPU and wall time limits for this problem.'),
+        ),
+    ]
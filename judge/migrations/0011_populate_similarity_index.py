@@ -0,0 +1,38 @@
+from django.db import migrations
+
+from judge import similarity
+
+
+def index_solutions(apps, schema_editor):
+    # Fingerprint solutions saved before the index existed, which the
+    # post_save signal never saw.  Uses historical models, so it does not
+    # go through similarity.store().
+    Solution = apps.get_model('judge', 'Solution')
+    SolutionFingerprint = apps.get_model('judge', 'SolutionFingerprint')
+    FingerprintPosting = apps.get_model('judge', 'FingerprintPosting')
+
+    indexed = set(SolutionFingerprint.objects.values_list('solution_id', flat=True))
+    prints, postings = [], []
+    for solution_id, problem_id, code in Solution.objects.values_list('id', 'problem_id', 'code').iterator(chunk_size=500):
+        if solution_id in indexed:
+            continue
+        hashes = similarity.fingerprint(code)
+        prints.append(SolutionFingerprint(solution_id=solution_id, problem_id=problem_id, size=len(hashes)))
+        postings.extend(FingerprintPosting(solution_id=solution_id, problem_id=problem_id, hash=h) for h in hashes)
+        if len(prints) >= 500:
+            SolutionFingerprint.objects.bulk_create(prints)
+            FingerprintPosting.objects.bulk_create(postings, batch_size=1000)
+            prints, postings = [], []
+    SolutionFingerprint.objects.bulk_create(prints)
+    FingerprintPosting.objects.bulk_create(postings, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0010_submissionprofile'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_solutions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_hashes(apps, schema_editor):
+    # Seed the document frequencies from the postings written so far;
+    # similarity.store() keeps them up to date from here on.
+    FingerprintPosting = apps.get_model('judge', 'FingerprintPosting')
+    FingerprintFrequency = apps.get_model('judge', 'FingerprintFrequency')
+
+    rows = (FingerprintPosting.objects.values('problem_id', 'hash')
+            .annotate(n=Count('id')).order_by())
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        batch.append(FingerprintFrequency(problem_id=row['problem_id'], hash=row['hash'], count=row['n']))
+        if len(batch) >= 1000:
+            FingerprintFrequency.objects.bulk_create(batch)
+            batch = []
+    FingerprintFrequency.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0011_populate_similarity_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FingerprintFrequency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.BigIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='judge.problem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['problem', 'count'], name='judge_finge_problem_089c62_idx')],
+                'unique_together': {('problem', 'hash')},
+            },
+        ),
+        migrations.RunPython(count_hashes, migrations.RunPython.noop),
+    ]
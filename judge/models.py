@@ -12,17 +12,45 @@ from django.conf import settings
 
 from django.db import models  # type: ignore
 
+from . import results, runners
+
 
 class Problem(models.Model):
     """A programming challenge for students to solve.
 
     Each problem has a title and a longer description.  A problem can
     have multiple associated test cases which define the expected
-    behaviour of a correct solution.
+    behaviour of a correct solution.  ``forbidden_imports`` and
+    ``requires_input`` are rules for the pre-judge checks in
+    ``judge/precheck.py``.  ``language`` and ``time_multiplier`` choose
+    the runtime and scale the time limit (``judge/runners.py``); a
+    problem with an ``interactor`` is judged interactively.
     """
 
     title = models.CharField(max_length=200)
     description = models.TextField()
+    forbidden_imports = models.CharField(
+        max_length=500, blank=True,
+        default='os subprocess socket shutil ctypes multiprocessing',
+        help_text='Space- or comma-separated top-level modules submissions may not import.',
+    )
+    requires_input = models.BooleanField(
+        default=True,
+        help_text='Reject submissions that never read standard input (when tests provide input).',
+    )
+    language = models.CharField(
+        max_length=20, default='python3', choices=runners.language_choices(),
+    )
+    time_multiplier = models.FloatField(
+        default=1.0,
+        help_text='Scales the sandbox CPU and wall time limits for this problem.',
+    )
+    interactor = models.TextField(
+        blank=True,
+        help_text='Python judge program for interactive problems.  It is run with the '
+                  'test input file as argv[1], talks to the submission over stdin/stdout '
+                  'and exits 0 to accept.',
+    )
 
     def __str__(self) -> str:
         return self.title
@@ -60,7 +88,9 @@ class Submission(models.Model):
         related_name='submissions',
         null=True, blank=True,  # keep nullable for existing rows; can enforce later
     )
-    per_test_results = models.JSONField(default=list, blank=True) 
+    # Compact arrays referencing TestCase ids; see judge/results.py.
+    # Read it through test_results()/atest_results(), not directly.
+    per_test_results = models.JSONField(default=list, blank=True)
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='submissions')
     code = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -71,7 +101,20 @@ class Submission(models.Model):
     def __str__(self) -> str:
         status = 'passed' if self.passed else 'failed' if self.passed is not None else 'pending'
         return f'Submission #{self.pk} for {self.problem.title} ({status})'
-    
+
+    def test_results(self) -> list:
+        """Per-test results expanded for display, with inputs and expected
+        outputs loaded from the referenced ``TestCase`` rows."""
+        ids = results.referenced_case_ids(self.per_test_results)
+        cases = TestCase.objects.in_bulk(ids) if ids else {}
+        return results.decode(self.per_test_results, cases)
+
+    async def atest_results(self) -> list:
+        """Async counterpart of :meth:`test_results`."""
+        ids = results.referenced_case_ids(self.per_test_results)
+        cases = await TestCase.objects.ain_bulk(ids) if ids else {}
+        return results.decode(self.per_test_results, cases)
+
 
 # models.py
 class Solution(models.Model):
@@ -93,4 +136,60 @@ class UserProblemStat(models.Model):
     last_submission_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
-        unique_together = ('user', 'problem')
\ No newline at end of file
+        unique_together = ('user', 'problem')
+
+class SolutionFingerprint(models.Model):
+    """Winnowed k-gram fingerprints of a ``Solution`` (see judge/similarity.py).
+
+    ``size`` is the number of distinct fingerprints, kept so similarity
+    scores can be normalised without counting postings again.
+    """
+    solution = models.OneToOneField(Solution, on_delete=models.CASCADE, related_name='fingerprint')
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
+    size = models.PositiveIntegerField(default=0)
+
+
+class FingerprintPosting(models.Model):
+    """One entry of the inverted index: ``hash`` occurs in ``solution``."""
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
+    hash = models.BigIntegerField()
+    solution = models.ForeignKey(Solution, on_delete=models.CASCADE, related_name='postings')
+
+    class Meta:
+        indexes = [models.Index(fields=['problem', 'hash'])]
+        unique_together = ('solution', 'hash')
+
+
+class FingerprintFrequency(models.Model):
+    """How many of a problem's solutions contain ``hash``.
+
+    Kept in step with the postings by ``judge/similarity.py`` so that
+    boilerplate hashes can be found without counting postings.
+    """
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
+    hash = models.BigIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['problem', 'count'])]
+        unique_together = ('problem', 'hash')
+
+
+class SubmissionProfile(models.Model):
+    """An opt-in sampling profile of a submission on one failing test.
+
+    ``data`` is the compact report written by ``judge/profiling.py``:
+    the hottest functions and source lines by sample count.  Profiles are
+    computed in the background, so a new row starts out ``pending``.
+    """
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, related_name='profile')
+    test_case = models.ForeignKey(TestCase, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    data = models.JSONField(default=dict, blank=True)
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,139 @@
+"""
+Static checks run on a submission before any test is executed.
+
+The code is parsed once with :mod:`ast`; a syntax error is reported
+straight away as a compilation error.  The tree is then passed to each
+check listed in ``settings.JUDGE_PRECHECKS`` (dotted paths, in order).
+A check is a callable ``check(tree, problem, test_cases)`` that returns
+``None`` when the submission is acceptable, or a message explaining why
+it is rejected.  The first rejection wins and no sandbox is launched.
+
+Results are cached by a hash of the code and the problem's rules, so
+resubmitting identical code does not parse it again.  Parsing happens in
+the web process, outside the sandbox, so submissions larger than
+``settings.JUDGE_PRECHECK_MAX_CODE_SIZE`` characters are rejected without
+being parsed, and code nested too deeply for the parser is reported as a
+compilation error.
+"""
+
+from __future__ import annotations
+
+import ast
+import hashlib
+import re
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings  # type: ignore
+from django.core.cache import cache  # type: ignore
+from django.utils.module_loading import import_string  # type: ignore
+
+from . import results
+
+DEFAULT_PRECHECKS = [
+    'judge.precheck.check_forbidden_imports',
+    'judge.precheck.check_reads_input',
+]
+
+# Names whose use counts as reading standard input.
+INPUT_NAMES = {'input', 'stdin', 'fileinput'}
+
+CACHE_PREFIX = 'precheck'
+
+DEFAULT_MAX_CODE_SIZE = 64 * 1024
+
+
+def forbidden_modules(problem) -> set:
+    return {m for m in re.split(r'[\s,]+', problem.forbidden_imports or '') if m}
+
+
+def check_forbidden_imports(tree: ast.AST, problem, test_cases: Sequence) -> Optional[str]:
+    """Reject ``import x`` / ``from x import`` / ``__import__('x')`` of forbidden modules."""
+    forbidden = forbidden_modules(problem)
+    if not forbidden:
+        return None
+    for node in ast.walk(tree):
+        names: Iterable[str] = ()
+        if isinstance(node, ast.Import):
+            names = (alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names = (node.module,)
+        elif (isinstance(node, ast.Call) and node.args
+              and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)
+              and (isinstance(node.func, ast.Name) and node.func.id == '__import__'
+                   or isinstance(node.func, ast.Attribute) and node.func.attr == 'import_module')):
+            names = (node.args[0].value,)
+        for name in names:
+            top = name.split('.')[0]
+            if top in forbidden:
+                return f'Line {node.lineno}: importing "{top}" is not allowed for this problem.'
+    return None
+
+
+def check_reads_input(tree: ast.AST, problem, test_cases: Sequence) -> Optional[str]:
+    """Reject programs that never read stdin when the tests supply input."""
+    if not problem.requires_input:
+        return None
+    if not any((case.input_data or '').strip() for case in test_cases):
+        return None
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in INPUT_NAMES:
+            return None
+        if isinstance(node, ast.Attribute) and node.attr in INPUT_NAMES:
+            return None
+        if isinstance(node, ast.alias) and node.name.split('.')[0] in INPUT_NAMES:
+            return None
+        # open(0) reads file descriptor 0, i.e. standard input.
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'open'
+                and node.args and isinstance(node.args[0], ast.Constant) and node.args[0].value == 0):
+            return None
+    return 'Your program never reads standard input, but the tests provide input.'
+
+
+def get_checks() -> List:
+    return [import_string(path) for path in getattr(settings, 'JUDGE_PRECHECKS', DEFAULT_PRECHECKS)]
+
+
+def _cache_key(code: str, problem, test_cases: Sequence) -> str:
+    rules = '|'.join([
+        ','.join(getattr(settings, 'JUDGE_PRECHECKS', DEFAULT_PRECHECKS)),
+        ' '.join(sorted(forbidden_modules(problem))),
+        str(problem.requires_input),
+        str(any((case.input_data or '').strip() for case in test_cases)),
+    ])
+    digest = hashlib.sha256(f'{rules}\0{code}'.encode('utf-8')).hexdigest()
+    return f'{CACHE_PREFIX}:{digest}'
+
+
+def run_prechecks(code: str, problem, test_cases: Sequence) -> Optional[Tuple[str, str]]:
+    """Return ``(verdict, message)`` if the submission is rejected, else ``None``."""
+    max_size = int(getattr(settings, 'JUDGE_PRECHECK_MAX_CODE_SIZE', DEFAULT_MAX_CODE_SIZE))
+    if len(code) > max_size:
+        return (results.VERDICT_REJECTED,
+                f'Your program is longer than {max_size} characters.')
+
+    key = _cache_key(code, problem, test_cases)
+    cached = cache.get(key)
+    if cached is not None:
+        return tuple(cached) if cached else None
+
+    outcome: Optional[Tuple[str, str]] = None
+    try:
+        tree = ast.parse(code, filename='<submission>')
+    except SyntaxError as exc:
+        outcome = (results.VERDICT_COMPILE_ERROR,
+                   f'Line {exc.lineno}: {exc.msg}' if exc.lineno else exc.msg)
+    except ValueError as exc:  # e.g. source containing null bytes
+        outcome = (results.VERDICT_COMPILE_ERROR, str(exc))
+    except (RecursionError, MemoryError):
+        # CPython would fail the same way compiling it in the sandbox.
+        outcome = (results.VERDICT_COMPILE_ERROR, 'Your program is nested too deeply to compile.')
+    else:
+        for check in get_checks():
+            message = check(tree, problem, test_cases)
+            if message:
+                outcome = (results.VERDICT_REJECTED, message)
+                break
+
+    cache.set(key, list(outcome) if outcome else [],
+              getattr(settings, 'JUDGE_PRECHECK_CACHE_TIMEOUT', 3600))
+    return outcome
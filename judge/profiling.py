@@ -0,0 +1,329 @@
+"""
+Opt-in profiling of slow or failing submissions.
+
+When a student asks for a profile, the submission is run once more on
+its first failing test (a time-limit failure if there is one) under a
+sampling profiler inside the sandbox.  Every ``interval`` seconds of CPU
+time (``ITIMER_PROF``) the profiler records which line of the student's
+file is executing and which of its functions are on the stack, so the
+overhead stays small and does not depend on how many calls the program
+makes.  Profiling stops after ``budget`` CPU seconds whether or not the
+program has finished, which also bounds the cost of profiling an
+infinite loop.
+
+The report kept in ``SubmissionProfile.data`` is compact::
+
+    {
+        "v": 1,
+        "interval": 0.005,
+        "samples": 400,
+        "truncated": true,          # budget ran out before the program ended
+        "functions": [["solve", 3, 380, 398], ...],   # name, def line, self, total
+        "lines": [[7, 350], [8, 30], ...],            # line number, samples
+    }
+
+The report is written by the same interpreter that runs the student's
+code, which can reach the report pipe too, so :func:`profile_code` reads
+at most ``MAX_REPORT_SIZE`` bytes and rejects anything not shaped like
+the above.
+
+Profiles run on a small background thread pool (:func:`schedule`) so the
+request that asks for one returns immediately; ``manage.py
+run_profiles`` picks up any that were left pending, e.g. after a restart.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from django.conf import settings  # type: ignore
+from django.db import close_old_connections  # type: ignore
+
+from . import results, runners
+from .sandbox import SandboxProcess, collect_result
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Upper bound on the report read back from the sandbox; a genuine one with
+# the default ``top`` is well under a kilobyte.
+MAX_REPORT_SIZE = 64 * 1024
+MAX_NAME_LENGTH = 200
+
+DEFAULTS = {
+    'interval': 0.005,   # CPU seconds between samples
+    'budget': 2.0,       # CPU seconds of profiled execution at most
+    'top': 10,           # functions and lines kept in the report
+    'workers': 1,        # background profiling threads per process
+}
+
+# Runs inside the sandbox as ``python3 -c _PROFILER <fd> <source> <interval>
+# <budget> <top>``; writes the JSON report to <fd> and exits.
+_PROFILER = r'''
+import collections, json, os, signal, sys
+_fd, _source = int(sys.argv[1]), sys.argv[2]
+_interval, _budget, _top = float(sys.argv[3]), float(sys.argv[4]), int(sys.argv[5])
+sys.argv = [_source]
+os.set_inheritable(_fd, False)  # not passed on to programs the submission starts
+_lines = collections.Counter()
+_self = collections.Counter()
+_total = collections.Counter()
+_state = {'samples': 0, 'truncated': False}
+
+def _dump():
+    signal.setitimer(signal.ITIMER_PROF, 0)
+    report = {
+        'samples': _state['samples'],
+        'truncated': _state['truncated'],
+        'functions': [[name, line, n, _total[(name, line)]] for (name, line), n in _self.most_common(_top)],
+        'lines': [[line, n] for line, n in _lines.most_common(_top)],
+    }
+    os.write(_fd, json.dumps(report).encode())
+    os.close(_fd)
+
+def _sample(signum, frame):
+    _state['samples'] += 1
+    seen = set()
+    innermost = True
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename == _source:
+            key = (code.co_name, code.co_firstlineno)
+            if innermost:
+                _lines[frame.f_lineno] += 1
+                _self[key] += 1
+                innermost = False
+            if key not in seen:
+                _total[key] += 1
+                seen.add(key)
+        frame = frame.f_back
+    if _state['samples'] * _interval >= _budget:
+        _state['truncated'] = True
+        _dump()
+        sys.stdout.flush()
+        os._exit(0)
+
+signal.signal(signal.SIGPROF, _sample)
+signal.setitimer(signal.ITIMER_PROF, _interval, _interval)
+try:
+    with open(_source, 'rb') as _fh:
+        _code = compile(_fh.read(), _source, 'exec')
+    exec(_code, {'__name__': '__main__', '__file__': _source, '__builtins__': __builtins__})
+except BaseException:
+    pass
+_dump()
+'''
+
+
+def get_config() -> Dict[str, float]:
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'JUDGE_PROFILING', {}))
+    return conf
+
+
+def is_profilable(submission) -> bool:
+    """Whether a profile can be asked for: the submission ran and failed,
+    and its problem is not interactive (without its interactor the
+    program would only see the raw test file)."""
+    return (submission.passed is False and not submission.error
+            and not submission.problem.interactor.strip())
+
+
+def pick_test_case(submission) -> Optional[int]:
+    """Id of the test to profile: the first time-limit failure, else the
+    first failure of any kind."""
+    rows = submission.test_results()
+    failed = [r for r in rows if not r['passed'] and r.get('case_id')]
+    for row in failed:
+        if row['verdict'] == results.VERDICT_TIME_LIMIT:
+            return row['case_id']
+    return failed[0]['case_id'] if failed else None
+
+
+def profile_code(code: str, input_data: str, problem=None) -> Dict[str, object]:
+    """Run ``code`` on ``input_data`` under the sampling profiler."""
+    conf = get_config()
+    runner = runners.get_runner('python3')
+    limits = runner.limits(problem)
+    # Enough headroom for the profiler to hit its own budget and report,
+    # rather than being killed by the sandbox first.
+    limits['cpu_time'] = float(conf['budget']) + 1
+    limits['wall_time'] = max(float(limits['wall_time']), float(conf['budget']) * 3)
+
+    source = runners.write_source(code, runner)
+    report_r, report_w = os.pipe()
+    try:
+        with tempfile.TemporaryFile() as stdin, \
+                tempfile.TemporaryFile() as stdout, \
+                tempfile.TemporaryFile() as stderr:
+            stdin.write(input_data.encode('utf-8'))
+            stdin.seek(0)
+            argv = [runner.executable, '-c', _PROFILER, str(report_w), str(source),
+                    str(conf['interval']), str(conf['budget']), str(int(conf['top']))]
+            try:
+                proc = SandboxProcess(argv, limits, stdin, stdout, stderr, pass_fds=(report_w,))
+            finally:
+                os.close(report_w)
+            proc.start_clock()
+            chunks: List[bytes] = []
+            size = 0
+            while True:
+                chunk = os.read(report_r, 65536)
+                if not chunk:
+                    break
+                # Keep draining so the writer is not blocked, but only
+                # hold on to what a valid report could need.
+                if size <= MAX_REPORT_SIZE:
+                    chunks.append(chunk)
+                size += len(chunk)
+            outcome = collect_result(proc, stdout, stderr)
+    finally:
+        os.close(report_r)
+        source.unlink(missing_ok=True)
+
+    if not chunks:
+        raise RuntimeError(outcome.kill_message or 'The profiler produced no report.')
+    if size > MAX_REPORT_SIZE:
+        raise ValueError('The profiler report is too large.')
+    try:
+        report = json.loads(b''.join(chunks))
+    except ValueError:
+        raise ValueError('Malformed profiler report.') from None
+    report = validate_report(report, int(conf['top']))
+    report['v'] = FORMAT_VERSION
+    report['interval'] = conf['interval']
+    return report
+
+
+def _is_count(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def _is_function_row(row) -> bool:
+    return (isinstance(row, list) and len(row) == 4 and isinstance(row[0], str)
+            and all(_is_count(v) for v in row[1:]))
+
+
+def _is_line_row(row) -> bool:
+    return isinstance(row, list) and len(row) == 2 and all(_is_count(v) for v in row)
+
+
+def validate_report(report, top: int) -> Dict[str, object]:
+    """Return a clean copy of a report read from the sandbox, or raise
+    ``ValueError`` if it is not shaped like one the profiler writes."""
+    if not isinstance(report, dict):
+        raise ValueError('Malformed profiler report.')
+    functions = report.get('functions')
+    lines = report.get('lines')
+    if (not _is_count(report.get('samples')) or not isinstance(report.get('truncated'), bool)
+            or not isinstance(functions, list) or not isinstance(lines, list)
+            or len(functions) > top or len(lines) > top
+            or not all(_is_function_row(r) for r in functions)
+            or not all(_is_line_row(r) for r in lines)):
+        raise ValueError('Malformed profiler report.')
+    return {
+        'samples': report['samples'],
+        'truncated': report['truncated'],
+        'functions': [[name[:MAX_NAME_LENGTH], line, own, total]
+                      for name, line, own, total in functions],
+        'lines': [list(row) for row in lines],
+    }
+
+
+def run_profile(profile_id: int) -> None:
+    """Compute a pending ``SubmissionProfile``; safe to call from any thread."""
+    from .models import SubmissionProfile, TestCase
+
+    close_old_connections()
+    try:
+        profile = SubmissionProfile.objects.select_related('submission__problem').get(pk=profile_id)
+        if profile.status != SubmissionProfile.PENDING:
+            return
+        submission = profile.submission
+        case_id = pick_test_case(submission)
+        case = TestCase.objects.filter(pk=case_id).first() if case_id else None
+        if not is_profilable(submission):
+            profile.status = SubmissionProfile.FAILED
+            profile.message = 'This submission cannot be profiled.'
+        elif case is None:
+            profile.status = SubmissionProfile.FAILED
+            profile.message = 'No failing test to profile.'
+        else:
+            try:
+                profile.data = profile_code(submission.code, case.input_data, submission.problem)
+                profile.status = SubmissionProfile.DONE
+            except (RuntimeError, ValueError) as exc:
+                profile.status = SubmissionProfile.FAILED
+                profile.message = str(exc)
+            profile.test_case = case
+        profile.save()
+    except Exception:
+        # Nothing else reports errors from the background pool, and a
+        # profile left pending would be shown as "in progress" forever.
+        logger.exception('Profiling failed for profile %s', profile_id)
+        try:
+            SubmissionProfile.objects.filter(pk=profile_id, status=SubmissionProfile.PENDING).update(
+                status=SubmissionProfile.FAILED, message='The profiler could not be run.',
+            )
+        except Exception:
+            logger.exception('Could not mark profile %s as failed', profile_id)
+    finally:
+        close_old_connections()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def schedule(profile_id: int) -> None:
+    """Compute a profile in the background of this process."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=int(get_config()['workers']),
+                                           thread_name_prefix='judge-profile')
+    _executor.submit(run_profile, profile_id)
+
+
+def annotate(data: Dict[str, object], code: str) -> Dict[str, object]:
+    """Add percentages and source text to a stored report for display.
+
+    Rows that do not match the expected shape (e.g. reports stored before
+    they were validated) are skipped rather than failing the page.
+    """
+    if not isinstance(data, dict) or not data:
+        return {}
+    functions = data.get('functions') if isinstance(data.get('functions'), list) else []
+    lines = data.get('lines') if isinstance(data.get('lines'), list) else []
+    count = data.get('samples') if _is_count(data.get('samples')) else 0
+    samples = count or 1
+    try:
+        seconds = count * float(data.get('interval', 0))
+    except (TypeError, ValueError):
+        seconds = 0.0
+    source_lines = code.splitlines()
+
+    def text(line: int) -> str:
+        return source_lines[line - 1].strip() if 0 < line <= len(source_lines) else ''
+
+    return {
+        'samples': count,
+        'seconds': seconds,
+        'truncated': bool(data.get('truncated')),
+        'functions': [
+            {'name': name, 'line': line, 'self_pct': 100.0 * own / samples,
+             'total_pct': 100.0 * total / samples}
+            for name, line, own, total in filter(_is_function_row, functions)
+        ],
+        'lines': [
+            {'line': line, 'count': n, 'pct': 100.0 * n / samples, 'text': text(line)}
+            for line, n in filter(_is_line_row, lines)
+        ],
+    }
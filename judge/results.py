@@ -0,0 +1,234 @@
+"""
+Compact storage format for ``Submission.per_test_results``.
+
+Older rows stored one dict per test, each repeating every key and a
+full copy of the test's input and expected output.  New rows store
+parallel arrays instead and refer to ``TestCase`` rows by id::
+
+    {
+        "v": 2,
+        "case_ids": [3, 4, 5],
+        "verdicts": ["AC", "WA", "TLE"],
+        "time_ms": [21, 19, 2003],
+        "memory_kb": [9012, 9020, 9100],
+        "returncodes": [0, 0, null],
+        "actual": ["4", "7", ""],          # truncated
+        "stderr": ["", "", "Time limit exceeded"],
+    }
+
+When ``JUDGE_RESULTS_COMPRESS`` is enabled, ``actual`` and ``stderr``
+are replaced by ``"z"``: zlib-compressed, base64-encoded JSON of the two
+lists (only when that is actually smaller).
+
+The functions here are pure so the data migration can use them with
+historical models.  Views, templates and admin read results through
+``Submission.test_results()`` / ``Submission.atest_results()``.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import zlib
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+FORMAT_VERSION = 2
+
+VERDICT_ACCEPTED = 'AC'
+VERDICT_WRONG_ANSWER = 'WA'
+VERDICT_RUNTIME_ERROR = 'RE'
+VERDICT_TIME_LIMIT = 'TLE'
+VERDICT_MEMORY_LIMIT = 'MLE'
+VERDICT_OUTPUT_LIMIT = 'OLE'
+VERDICT_PROCESS_LIMIT = 'PLE'
+VERDICT_COMPILE_ERROR = 'CE'
+VERDICT_REJECTED = 'REJ'
+
+VERDICT_LABELS = {
+    VERDICT_ACCEPTED: 'Accepted',
+    VERDICT_WRONG_ANSWER: 'Wrong answer',
+    VERDICT_RUNTIME_ERROR: 'Runtime error',
+    VERDICT_TIME_LIMIT: 'Time limit exceeded',
+    VERDICT_MEMORY_LIMIT: 'Memory limit exceeded',
+    VERDICT_OUTPUT_LIMIT: 'Output limit exceeded',
+    VERDICT_PROCESS_LIMIT: 'Process limit exceeded',
+    VERDICT_COMPILE_ERROR: 'Compilation error',
+    VERDICT_REJECTED: 'Rejected',
+}
+
+# Sandbox kill reasons (judge.sandbox.KILLED_*) to verdicts.
+KILL_VERDICTS = {
+    'cpu': VERDICT_TIME_LIMIT,
+    'wall': VERDICT_TIME_LIMIT,
+    'memory': VERDICT_MEMORY_LIMIT,
+    'output': VERDICT_OUTPUT_LIMIT,
+    'pids': VERDICT_PROCESS_LIMIT,
+}
+
+DEFAULT_TEXT_LIMIT = 1024
+
+
+def _settings_value(name: str, default):
+    from django.conf import settings  # type: ignore
+    return getattr(settings, name, default)
+
+
+def truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f'... [{len(text) - limit} more characters]'
+
+
+def encode(rows: Iterable[Mapping[str, object]],
+           text_limit: Optional[int] = None,
+           compress: Optional[bool] = None) -> Dict[str, object]:
+    """Pack per-test dicts into the compact format.
+
+    Each row needs ``case_id``, ``verdict``, ``actual``, ``stderr``,
+    ``returncode`` and optionally ``time`` (seconds) and ``memory``
+    (bytes).
+    """
+    if text_limit is None:
+        text_limit = _settings_value('JUDGE_RESULTS_TEXT_LIMIT', DEFAULT_TEXT_LIMIT)
+    if compress is None:
+        compress = _settings_value('JUDGE_RESULTS_COMPRESS', False)
+
+    data: Dict[str, object] = {
+        'v': FORMAT_VERSION,
+        'case_ids': [],
+        'verdicts': [],
+        'time_ms': [],
+        'memory_kb': [],
+        'returncodes': [],
+    }
+    actual: List[str] = []
+    stderr: List[str] = []
+    for row in rows:
+        data['case_ids'].append(row.get('case_id'))
+        data['verdicts'].append(row['verdict'])
+        time_s = row.get('time')
+        data['time_ms'].append(None if time_s is None else int(round(float(time_s) * 1000)))
+        memory = row.get('memory')
+        data['memory_kb'].append(None if memory is None else int(memory) // 1024)
+        data['returncodes'].append(row.get('returncode'))
+        actual.append(truncate(str(row.get('actual') or ''), text_limit))
+        stderr.append(truncate(str(row.get('stderr') or ''), text_limit))
+
+    plain = json.dumps([actual, stderr], separators=(',', ':'))
+    packed = base64.b64encode(zlib.compress(plain.encode('utf-8'), 6)).decode('ascii') if compress else None
+    if packed is not None and len(packed) < len(plain):
+        data['z'] = packed
+    else:
+        data['actual'] = actual
+        data['stderr'] = stderr
+    return data
+
+
+def _texts(data: Mapping[str, object]) -> Tuple[List[str], List[str]]:
+    if 'z' in data:
+        actual, stderr = json.loads(zlib.decompress(base64.b64decode(data['z'])).decode('utf-8'))
+        return actual, stderr
+    return list(data.get('actual', [])), list(data.get('stderr', []))
+
+
+def is_compact(data) -> bool:
+    return isinstance(data, dict) and data.get('v') == FORMAT_VERSION
+
+
+def referenced_case_ids(data) -> List[int]:
+    if is_compact(data):
+        return [cid for cid in data['case_ids'] if cid is not None]
+    return []
+
+
+def legacy_verdict(row: Mapping[str, object]) -> str:
+    """Best-effort verdict for a row written in the old list format."""
+    if row.get('verdict'):
+        return str(row['verdict'])
+    if row.get('passed'):
+        return VERDICT_ACCEPTED
+    if row.get('killed_by') in KILL_VERDICTS:
+        return KILL_VERDICTS[row['killed_by']]
+    if row.get('stderr') == 'Time limit exceeded':
+        return VERDICT_TIME_LIMIT
+    if row.get('returncode') not in (0, None):
+        return VERDICT_RUNTIME_ERROR
+    return VERDICT_WRONG_ANSWER
+
+
+def _same_case(row: Mapping[str, object], case) -> bool:
+    return (row.get('input') == case.input_data
+            and row.get('expected') == (case.expected_output or '').strip())
+
+
+def from_legacy(rows: Iterable[Mapping[str, object]], cases: List[object],
+                **kwargs) -> Optional[Dict[str, object]]:
+    """Convert old list-format rows to the compact format.
+
+    Old rows carry a 1-based ``index`` into the problem's test cases
+    ordered by id, plus a copy of the test's input and expected output.
+    ``cases`` must be the problem's current test cases in that order.  A
+    row only references a case whose input and expected output still
+    match its copy (the one at ``index`` first, then any other), since
+    cases may have been added, removed or edited since it was judged.
+    Returns ``None`` when some row has no matching case; such results
+    should stay in the old format, which :func:`decode` still reads.
+    """
+    converted = []
+    for row in rows:
+        index = int(row.get('index') or 0)
+        candidates = ([cases[index - 1]] if 0 < index <= len(cases) else []) + list(cases)
+        case = next((c for c in candidates if _same_case(row, c)), None)
+        if case is None:
+            return None
+        converted.append({
+            'case_id': case.pk,
+            'verdict': legacy_verdict(row),
+            'actual': row.get('actual', ''),
+            'stderr': row.get('stderr', ''),
+            'returncode': row.get('returncode'),
+            'time': row.get('time'),
+            'memory': row.get('memory'),
+        })
+    return encode(converted, **kwargs)
+
+
+def decode(data, cases: Mapping[int, object]) -> List[Dict[str, object]]:
+    """Expand stored results into one dict per test for display.
+
+    ``cases`` maps test case id to an object with ``input_data`` and
+    ``expected_output`` (a ``TestCase`` or historical model instance).
+    Rows still in the old list format are passed through with
+    ``verdict`` filled in.
+    """
+    if not is_compact(data):
+        rows = []
+        for row in data or []:
+            row = dict(row)
+            row['verdict'] = legacy_verdict(row)
+            row['verdict_label'] = VERDICT_LABELS.get(row['verdict'], row['verdict'])
+            rows.append(row)
+        return rows
+
+    actual, stderr = _texts(data)
+    rows = []
+    for i, case_id in enumerate(data['case_ids']):
+        case = cases.get(case_id)
+        time_ms = data['time_ms'][i]
+        memory_kb = data['memory_kb'][i]
+        verdict = data['verdicts'][i]
+        rows.append({
+            'index': i + 1,
+            'case_id': case_id,
+            'input': case.input_data if case is not None else '',
+            'expected': (case.expected_output or '').strip() if case is not None else '(test case removed)',
+            'actual': actual[i],
+            'stderr': stderr[i],
+            'returncode': data['returncodes'][i],
+            'verdict': verdict,
+            'verdict_label': VERDICT_LABELS.get(verdict, verdict),
+            'passed': verdict == VERDICT_ACCEPTED,
+            'time': None if time_ms is None else time_ms / 1000.0,
+            'memory': None if memory_kb is None else memory_kb * 1024,
+        })
+    return rows
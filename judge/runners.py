@@ -0,0 +1,373 @@
+"""
+Language runtimes used to execute submissions.
+
+A :class:`Runner` knows how to start one kind of program inside the
+sandbox (``judge/sandbox.py``).  Runners register themselves by language
+key; a problem picks one with ``Problem.language`` (``'auto'`` picks the
+fastest runtime installed on this host) and can scale the time limit
+with ``Problem.time_multiplier``.  Each runner may apply its own
+multiplier as well, configured in ``settings.JUDGE_RUNNERS``.
+
+Built-in runners:
+
+``python3``
+    CPython, one fresh interpreter per test.
+``pypy3``
+    PyPy, when ``pypy3`` is on ``PATH``.  Much faster for CPU-heavy
+    problems once the JIT has warmed up.
+``python3-warm``
+    CPython from a pool of interpreters started ahead of time, so the
+    interpreter start-up cost is paid while the previous test runs.
+
+Interactive problems (``Problem.interactor`` is set) run the problem's
+judge program and the submission side by side, connected through pipes
+(see :func:`run_interactive`).
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import fcntl
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Deque, Dict, List, Tuple, Type
+
+from django.conf import settings  # type: ignore
+
+from .sandbox import (KILL_MESSAGES, SandboxProcess, SandboxResult, collect_result, get_limits,
+                      run_sandboxed, write_private)
+
+AUTO = 'auto'
+
+_registry: Dict[str, 'Runner'] = {}
+
+
+def register(cls: Type['Runner']) -> Type['Runner']:
+    """Class decorator adding a runner to the registry."""
+    _registry[cls.language] = cls()
+    return cls
+
+
+def get_runner(language: str) -> 'Runner':
+    """Return the runner for ``language`` (``'auto'`` for the fastest)."""
+    if language == AUTO:
+        return fastest_runner()
+    try:
+        runner = _registry[language]
+    except KeyError:
+        raise ValueError(f'Unknown language {language!r}.') from None
+    if not runner.available():
+        raise ValueError(f'{runner.label} is not installed on this judge.')
+    return runner
+
+
+def runner_for(problem) -> 'Runner':
+    """Runner for ``problem``, falling back to the fastest installed one
+    when the configured runtime is missing on this host."""
+    language = getattr(problem, 'language', None) or CPythonRunner.language
+    runner = _registry.get(language)
+    if runner is None or not runner.available():
+        return fastest_runner()
+    return runner
+
+
+def available_runners() -> List['Runner']:
+    return [r for r in _registry.values() if r.available()]
+
+
+def fastest_runner() -> 'Runner':
+    return min(available_runners(), key=lambda r: r.speed_rank)
+
+
+def language_choices() -> List[Tuple[str, str]]:
+    return [(AUTO, 'Fastest available')] + [(r.language, r.label) for r in _registry.values()]
+
+
+class Runner:
+    """Base class: how to launch a program for one language."""
+
+    language = ''
+    label = ''
+    executable = ''
+    suffix = '.py'
+    # Lower is preferred when a problem asks for the fastest runtime.
+    speed_rank = 100
+
+    def available(self) -> bool:
+        return shutil.which(self.executable) is not None
+
+    @property
+    def time_multiplier(self) -> float:
+        conf = getattr(settings, 'JUDGE_RUNNERS', {}).get(self.language, {})
+        return float(conf.get('time_multiplier', 1.0))
+
+    def command(self, source: Path) -> List[str]:
+        return [self.executable, str(source)]
+
+    def limits(self, problem=None, **overrides) -> Dict[str, float]:
+        """Sandbox limits for this runner, scaled for ``problem``."""
+        limits = get_limits(**overrides)
+        factor = self.time_multiplier * (getattr(problem, 'time_multiplier', None) or 1.0)
+        limits['cpu_time'] = float(limits['cpu_time']) * factor
+        limits['wall_time'] = float(limits['wall_time']) * factor
+        return limits
+
+    def run(self, source: Path, input_data: str, limits: Dict[str, float]) -> SandboxResult:
+        return run_sandboxed(self.command(source), input_data, **limits)
+
+    def spawn(self, source: Path, limits: Dict[str, float], stdin, stdout, stderr) -> SandboxProcess:
+        """Start the program with caller-provided streams (interactive mode)."""
+        return SandboxProcess(self.command(source), limits, stdin, stdout, stderr)
+
+
+@register
+class CPythonRunner(Runner):
+    language = 'python3'
+    label = 'CPython 3'
+    executable = 'python3'
+    speed_rank = 50
+
+
+@register
+class PyPyRunner(Runner):
+    language = 'pypy3'
+    label = 'PyPy 3'
+    executable = 'pypy3'
+    speed_rank = 10
+
+
+# The warm interpreter writes one byte to the fd named in argv[1] once it
+# has booted, then waits for "<source>\0<stdin file>\n" on its stdin,
+# swaps the input file onto fd 0 and runs the submission as __main__.
+# Tracebacks are trimmed to the submission's own frames.
+_WARM_BOOTSTRAP = r'''
+import os, sys
+os.write(int(sys.argv[1]), b'.')
+os.close(int(sys.argv[1]))
+_source, _input = sys.stdin.buffer.readline().decode().rstrip('\n').split('\0')
+_fd = os.open(_input, os.O_RDONLY)
+os.dup2(_fd, 0)
+os.close(_fd)
+sys.stdin = open(0, 'r', encoding='utf-8', closefd=False)
+sys.argv = [_source]
+del os, _fd, _input
+# compile/exec rather than runpy.run_path, which costs more than a cold
+# interpreter start on its first call.
+try:
+    with open(_source, 'rb') as _fh:
+        _code = compile(_fh.read(), _source, 'exec')
+    exec(_code, {'__name__': '__main__', '__file__': _source, '__builtins__': __builtins__})
+except (SystemExit, KeyboardInterrupt):
+    raise
+except BaseException as _exc:
+    import traceback
+    _tb = _exc.__traceback__
+    while _tb is not None and _tb.tb_frame.f_code.co_filename != _source:
+        _tb = _tb.tb_next
+    traceback.print_exception(type(_exc), _exc, _tb)
+    sys.exit(1)
+'''
+
+
+@register
+class WarmPoolRunner(Runner):
+    language = 'python3-warm'
+    label = 'CPython 3 (warm pool)'
+    executable = 'python3'
+    speed_rank = 40
+
+    def __init__(self) -> None:
+        self._pools: Dict[tuple, Deque[Tuple[SandboxProcess, object, object]]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    @property
+    def pool_size(self) -> int:
+        conf = getattr(settings, 'JUDGE_RUNNERS', {}).get(self.language, {})
+        return int(conf.get('pool_size', 2))
+
+    def _start(self, limits: Dict[str, float]) -> Tuple[SandboxProcess, object, object]:
+        stdout = tempfile.TemporaryFile()
+        stderr = tempfile.TemporaryFile()
+        ready_r, ready_w = os.pipe()
+        try:
+            proc = SandboxProcess([self.executable, '-c', _WARM_BOOTSTRAP, str(ready_w)], limits,
+                                  subprocess.PIPE, stdout, stderr, pass_fds=(ready_w,))
+        finally:
+            os.close(ready_w)
+        proc.ready_fd = ready_r
+        return proc, stdout, stderr
+
+    @staticmethod
+    def _wait_ready(proc: SandboxProcess) -> None:
+        # Blocks only if the interpreter is still booting, so that its
+        # start-up CPU time is excluded by start_clock().  EOF means it died.
+        try:
+            os.read(proc.ready_fd, 1)
+        finally:
+            os.close(proc.ready_fd)
+
+    def _acquire(self, limits: Dict[str, float]) -> Tuple[SandboxProcess, object, object]:
+        with self._lock:
+            pool = self._pools[tuple(sorted(limits.items()))]
+            entry = pool.popleft() if pool else None
+        return entry if entry is not None else self._start(limits)
+
+    def _refill(self, limits: Dict[str, float]) -> None:
+        # Called after a run rather than during it, so booting spares does
+        # not compete with the program being timed.
+        key = tuple(sorted(limits.items()))
+        with self._lock:
+            missing = self.pool_size - len(self._pools[key])
+        for _ in range(max(0, missing)):
+            fresh = self._start(limits)
+            with self._lock:
+                self._pools[key].append(fresh)
+
+    def run(self, source: Path, input_data: str, limits: Dict[str, float]) -> SandboxResult:
+        proc, stdout, stderr = self._acquire(limits)
+        input_path = write_private(input_data, '.in')
+        try:
+            self._wait_ready(proc)
+            proc.start_clock()
+            try:
+                proc.proc.stdin.write(f'{source}\0{input_path}\n'.encode('utf-8'))
+                proc.proc.stdin.close()
+            except BrokenPipeError:
+                pass  # interpreter died while waiting; wait() reports it
+            with stdout, stderr:
+                return collect_result(proc, stdout, stderr)
+        finally:
+            os.unlink(input_path)
+            self._refill(limits)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            entries = [e for pool in self._pools.values() for e in pool]
+            self._pools.clear()
+        for proc, stdout, stderr in entries:
+            os.close(proc.ready_fd)
+            proc.discard()
+            stdout.close()
+            stderr.close()
+
+
+# ---------------------------------------------------------------------------
+# Interactive problems
+# ---------------------------------------------------------------------------
+
+DEFAULT_PIPE_BUFFER = 64 * 1024
+F_SETPIPE_SZ = getattr(fcntl, 'F_SETPIPE_SZ', 1031)
+
+
+def _bounded_pipe(size: int) -> Tuple[int, int]:
+    read_fd, write_fd = os.pipe()
+    try:
+        fcntl.fcntl(write_fd, F_SETPIPE_SZ, size)
+    except OSError:
+        pass  # keep the kernel default (also bounded)
+    return read_fd, write_fd
+
+
+class InteractiveResult:
+    """Outcome of an interactive test: the submission's sandbox result plus
+    the interactor's verdict (exit status 0 = accepted) and message."""
+
+    def __init__(self, result: SandboxResult, accepted: bool, message: str) -> None:
+        self.result = result
+        self.accepted = accepted
+        self.message = message
+
+
+# Runs the interactor from inherited fds: argv[1] holds its source and
+# argv[2] the test input, both unlinked files with no name on disk.  It
+# first makes itself non-dumpable so that, like the web process, its
+# /proc entries (and so those fds) are closed to other processes of the
+# same user.  The interactor itself sees the input as /dev/fd/<n>.
+_INTERACTOR_BOOTSTRAP = r'''
+import ctypes, os, sys
+ctypes.CDLL(None).prctl(4, 0, 0, 0, 0)  # PR_SET_DUMPABLE
+_source, _input = int(sys.argv[1]), int(sys.argv[2])
+with os.fdopen(_source, 'rb') as _fh:
+    _code = compile(_fh.read(), 'interactor.py', 'exec')
+sys.argv = ['interactor.py', f'/dev/fd/{_input}']
+del ctypes, _fh, _source, _input
+exec(_code, {'__name__': '__main__', '__file__': 'interactor.py', '__builtins__': __builtins__})
+'''
+
+
+def _unnamed_file(stack: contextlib.ExitStack, text: str) -> int:
+    fh = stack.enter_context(tempfile.TemporaryFile())
+    fh.write(text.encode('utf-8'))
+    fh.flush()
+    fh.seek(0)
+    # Readable by the interactor's sandbox uid when it reopens /dev/fd/<n>;
+    # there is no path, so nobody else can open it.
+    os.fchmod(fh.fileno(), 0o644)
+    return fh.fileno()
+
+
+def run_interactive(runner: Runner, source: Path, interactor: str, input_data: str,
+                    limits: Dict[str, float]) -> InteractiveResult:
+    """Run the submission against the problem's interactor.
+
+    ``interactor`` is the interactor's Python source.  It is run with the
+    path of the test input as ``argv[1]``; its stdout is the submission's
+    stdin and the submission's stdout is its stdin, through pipes capped
+    at ``JUDGE_INTERACTIVE_PIPE_BUFFER`` bytes so neither side can buffer
+    unbounded data.  The interactor exits 0 to accept and writes any
+    message to stderr.  It runs in the sandbox too (same limits, twice the
+    wall time, since it is alive for the whole of the submission's run),
+    so it does not see the web process's environment, and neither its
+    source nor the test input is ever written under a name the
+    submission could open.
+    """
+    size = int(getattr(settings, 'JUDGE_INTERACTIVE_PIPE_BUFFER', DEFAULT_PIPE_BUFFER))
+    judge_limits = dict(limits, wall_time=float(limits['wall_time']) * 2)
+    to_sub_r, to_sub_w = _bounded_pipe(size)
+    to_judge_r, to_judge_w = _bounded_pipe(size)
+
+    with tempfile.TemporaryFile() as sub_err, tempfile.TemporaryFile() as judge_err:
+        judge = None
+        try:
+            with contextlib.ExitStack() as hidden:
+                source_fd = _unnamed_file(hidden, interactor)
+                input_fd = _unnamed_file(hidden, input_data)
+                judge = SandboxProcess(
+                    [CPythonRunner.executable, '-c', _INTERACTOR_BOOTSTRAP, str(source_fd), str(input_fd)],
+                    judge_limits, to_judge_r, to_sub_w, judge_err, pass_fds=(source_fd, input_fd),
+                )
+            # Only the interactor holds the files now.
+            judge.start_clock()
+            sub = runner.spawn(source, limits, to_sub_r, to_judge_w, sub_err)
+        except BaseException:
+            if judge is not None:
+                judge.discard()
+            raise
+        finally:
+            # Only the children hold the pipe ends now, so either side
+            # sees EOF as soon as the other exits.
+            for fd in (to_sub_r, to_sub_w, to_judge_r, to_judge_w):
+                os.close(fd)
+
+        with tempfile.TemporaryFile() as empty:
+            result = collect_result(sub, empty, sub_err)
+        judge_status, _, _, _, judge_killed = judge.wait()
+        judge_err.seek(0)
+        message = judge_err.read(4096).decode('utf-8', errors='replace').strip()
+
+    if judge_killed is not None:
+        message = message or f'Interactor stopped: {KILL_MESSAGES[judge_killed].lower()}.'
+        return InteractiveResult(result, False, message)
+    return InteractiveResult(result, judge_status == 0, message)
+
+
+def write_source(code: str, runner: Runner) -> Path:
+    """Write ``code`` to a temporary file for ``runner``; caller deletes it."""
+    return write_private(code, runner.suffix)
@@ -0,0 +1,515 @@
+"""
+Isolated execution of submitted programs.
+
+Every test run goes through :func:`run_sandboxed`, which starts the
+program in its own cgroup v2 group with ``cpu.max``, ``memory.max`` and
+``pids.max`` set, so a fork bomb or memory hog cannot starve other
+judges on the same host.  When cgroup v2 is not available (or not
+writable by the judge user) the same limits are approximated with
+``setrlimit``.  Where the kernel allows it the child is also moved into
+an empty network namespace.
+
+When the judge runs as root, every run also drops to its own uid/gid
+from ``JUDGE_SANDBOX['uid_range']``.  That is what makes ``RLIMIT_NPROC``
+a per-run process limit in the fallback, and it keeps one program from
+reading another's files or ``/proc`` entries (including the interactor
+of an interactive problem).  Files a program must open by name go in
+:func:`private_dir` with unguessable names.
+
+Time limits are enforced on *CPU time*, not wall time, so verdicts stay
+comparable when the host is busy; the wall-clock deadline is only a
+generous backstop for programs that sleep or block on input.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import functools
+import itertools
+import os
+import random
+import resource
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings  # type: ignore
+
+
+# Kill reasons reported in ``SandboxResult.killed_by``.
+KILLED_CPU = 'cpu'
+KILLED_WALL = 'wall'
+KILLED_MEMORY = 'memory'
+KILLED_PIDS = 'pids'
+KILLED_OUTPUT = 'output'
+
+KILL_MESSAGES = {
+    KILLED_CPU: 'Time limit exceeded',
+    KILLED_WALL: 'Time limit exceeded (wall clock)',
+    KILLED_MEMORY: 'Memory limit exceeded',
+    KILLED_PIDS: 'Process limit exceeded',
+    KILLED_OUTPUT: 'Output limit exceeded',
+}
+
+DEFAULT_LIMITS = {
+    'cpu_time': 2.0,          # seconds of CPU time per test
+    'wall_time': 5.0,         # seconds of wall time per test
+    'memory': 256 * 1024 * 1024,
+    'pids': 16,
+    'output': 1024 * 1024,    # bytes kept from stdout/stderr
+    'cpu_quota': 1.0,         # cores, applied through cpu.max
+}
+
+CLONE_NEWNET = 0x40000000
+
+DEFAULT_UID_RANGE = (60000, 61000)
+
+
+class SandboxResult:
+    """Outcome of a single sandboxed run."""
+
+    def __init__(self, returncode: Optional[int], stdout: str, stderr: str,
+                 cpu_time: float, wall_time: float, memory: int,
+                 killed_by: Optional[str], backend: str) -> None:
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.cpu_time = cpu_time
+        self.wall_time = wall_time
+        self.memory = memory
+        self.killed_by = killed_by
+        self.backend = backend
+
+    @property
+    def kill_message(self) -> str:
+        return KILL_MESSAGES.get(self.killed_by, '') if self.killed_by else ''
+
+    def __repr__(self) -> str:
+        return (f'SandboxResult(returncode={self.returncode!r}, '
+                f'killed_by={self.killed_by!r}, cpu_time={self.cpu_time:.3f})')
+
+
+def get_limits(**overrides) -> Dict[str, float]:
+    """Return the effective limits: defaults, then settings, then overrides."""
+    limits = dict(DEFAULT_LIMITS)
+    limits.update(getattr(settings, 'JUDGE_SANDBOX', {}).get('limits', {}))
+    limits.update({k: v for k, v in overrides.items() if v is not None})
+    return limits
+
+
+_uid_counter = None
+_uid_lock = threading.Lock()
+
+
+def _next_uid() -> Optional[int]:
+    """uid (also used as gid) for the next run, or ``None`` when the judge
+    is not root and cannot switch users."""
+    global _uid_counter
+    if os.geteuid() != 0:
+        return None
+    low, high = getattr(settings, 'JUDGE_SANDBOX', {}).get('uid_range', DEFAULT_UID_RANGE)
+    with _uid_lock:
+        if _uid_counter is None:
+            # Random start so several judge processes rarely hand out the
+            # same uid at once.
+            _uid_counter = itertools.count(random.randrange(high - low))
+        return low + next(_uid_counter) % (high - low)
+
+
+def _world_executable(path: str) -> bool:
+    real = Path(os.path.realpath(path))
+    try:
+        return (real.is_file() and bool(real.stat().st_mode & 0o001)
+                and all(d.stat().st_mode & 0o001 for d in real.parents))
+    except OSError:
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def _sandbox_executable(name: str) -> str:
+    """``name`` resolved to a copy the sandbox uids may execute.
+
+    A judge running as root may find its own interpreter first on
+    ``PATH`` under a private home directory; the first ``PATH`` entry
+    that every user can reach is used instead.
+    """
+    if os.sep in name:
+        return name
+    for directory in os.environ.get('PATH', os.defpath).split(os.pathsep):
+        candidate = os.path.join(directory, name)
+        if _world_executable(candidate):
+            return candidate
+    return name
+
+
+_private_dir: Optional[Path] = None
+
+
+def private_dir() -> Path:
+    """Directory for files sandboxed programs open by name.
+
+    Mode 0711: a run can open a file it is told the name of, but cannot
+    list the directory to find other runs' files.
+    """
+    global _private_dir
+    with _uid_lock:
+        if _private_dir is None or not _private_dir.is_dir():
+            _private_dir = Path(tempfile.mkdtemp(prefix='judge-'))
+            _private_dir.chmod(0o711)
+        return _private_dir
+
+
+def write_private(text: str, suffix: str = '') -> Path:
+    """Write ``text`` to a new readable file in :func:`private_dir`;
+    the caller deletes it."""
+    fd, name = tempfile.mkstemp(suffix=suffix, dir=private_dir())
+    with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+        fh.write(text)
+    os.chmod(name, 0o644)
+    return Path(name)
+
+
+# ---------------------------------------------------------------------------
+# cgroup v2 helpers
+# ---------------------------------------------------------------------------
+
+_cgroup_root: Optional[Path] = None
+_cgroup_checked = False
+_cgroup_lock = threading.Lock()
+
+
+def _cgroup_parent() -> Optional[Path]:
+    """Return a writable cgroup v2 directory with cpu/memory/pids delegated.
+
+    The result is computed once per process.  ``None`` means the
+    ``setrlimit`` fallback must be used.
+    """
+    global _cgroup_root, _cgroup_checked
+    with _cgroup_lock:
+        if _cgroup_checked:
+            return _cgroup_root
+        _cgroup_checked = True
+        conf = getattr(settings, 'JUDGE_SANDBOX', {})
+        if not conf.get('use_cgroups', True):
+            return None
+        root = Path(conf.get('cgroup_root', '/sys/fs/cgroup/pythonforce'))
+        try:
+            if not (root.parent / 'cgroup.controllers').exists():
+                return None
+            root.mkdir(exist_ok=True)
+            wanted = {'cpu', 'memory', 'pids'}
+            available = set((root / 'cgroup.controllers').read_text().split())
+            if not wanted <= available:
+                return None
+            (root / 'cgroup.subtree_control').write_text(
+                ' '.join(f'+{c}' for c in sorted(wanted)))
+        except OSError:
+            return None
+        _cgroup_root = root
+        return root
+
+
+def _read_kv(path: Path) -> Dict[str, int]:
+    values: Dict[str, int] = {}
+    try:
+        for line in path.read_text().splitlines():
+            key, _, value = line.partition(' ')
+            if value.strip().isdigit():
+                values[key] = int(value)
+    except OSError:
+        pass
+    return values
+
+
+def _make_cgroup(parent: Path, limits: Dict[str, float]) -> Optional[Path]:
+    group = parent / f'run-{uuid.uuid4().hex}'
+    try:
+        group.mkdir()
+        period = 100000
+        quota = max(1000, int(period * float(limits['cpu_quota'])))
+        (group / 'cpu.max').write_text(f'{quota} {period}')
+        (group / 'memory.max').write_text(str(int(limits['memory'])))
+        (group / 'memory.swap.max').write_text('0')
+        (group / 'pids.max').write_text(str(int(limits['pids'])))
+    except OSError:
+        _remove_cgroup(group)
+        return None
+    return group
+
+
+def _kill_cgroup(group: Path) -> None:
+    try:
+        (group / 'cgroup.kill').write_text('1')
+    except OSError:
+        try:
+            pids = (group / 'cgroup.procs').read_text().split()
+        except OSError:
+            return  # group already gone
+        for pid in pids:
+            try:
+                os.kill(int(pid), signal.SIGKILL)
+            except (OSError, ValueError):
+                pass
+
+
+def _remove_cgroup(group: Path) -> None:
+    for _ in range(50):
+        try:
+            group.rmdir()
+            return
+        except FileNotFoundError:
+            return
+        except OSError:
+            # Processes may still be exiting after cgroup.kill.
+            time.sleep(0.01)
+
+
+# ---------------------------------------------------------------------------
+# Child setup
+# ---------------------------------------------------------------------------
+
+def _load_unshare() -> Optional[Callable[[int], int]]:
+    try:
+        return ctypes.CDLL(None, use_errno=True).unshare
+    except (OSError, AttributeError):
+        return None
+
+
+# Resolved once in the parent: the judge forks from worker threads, and
+# dlopen() in the child could block forever on a loader lock held by a
+# thread that does not exist there.
+_unshare = _load_unshare()
+
+
+def _make_preexec(limits: Dict[str, float], group: Optional[Path], uid: Optional[int]):
+    cpu = int(limits['cpu_time']) + 1
+    output = int(limits['output'])
+    memory = int(limits['memory'])
+    pids = int(limits['pids'])
+    procs = str(group / 'cgroup.procs') if group is not None else None
+    # RLIMIT_NPROC counts every process of the real uid, so it is only a
+    # per-run limit when the run has a uid of its own (or the judge runs
+    # as a dedicated account).
+    limit_nproc = uid is not None or os.getuid() != 0
+
+    # Runs between fork and exec in a possibly multi-threaded judge, so it
+    # sticks to plain system calls: no imports, dlopen or buffered I/O.
+    def preexec() -> None:
+        os.setsid()
+        if procs is not None:
+            # "0" moves the writing process itself into the group.
+            fd = os.open(procs, os.O_WRONLY)
+            try:
+                os.write(fd, b'0')
+            finally:
+                os.close(fd)
+        else:
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+            if limit_nproc:
+                resource.setrlimit(resource.RLIMIT_NPROC, (pids, pids))
+        # The CPU rlimit is kept in both modes: it is the cheapest way for
+        # the kernel itself to stop a spinning single-threaded program.
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (output, output))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        if _unshare is not None:
+            _unshare(CLONE_NEWNET)  # needs CAP_SYS_ADMIN; ignored if denied
+        if uid is not None:
+            # Last: everything above needs root.
+            os.setgroups([])
+            os.setgid(uid)
+            os.setuid(uid)
+
+    return preexec
+
+
+def _read_capped(fh, limit: int) -> str:
+    fh.seek(0)
+    return fh.read(limit).decode('utf-8', errors='replace')
+
+
+def _proc_cpu_time(pid: int) -> float:
+    """CPU time used so far by a live process, from /proc (0 if unknown)."""
+    try:
+        fields = Path(f'/proc/{pid}/stat').read_text().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+class SandboxProcess:
+    """A program started under the sandbox limits.
+
+    Most callers want :func:`run_sandboxed`.  This class exists for
+    callers that need control over the child's standard streams
+    (interactive problems wire them to another process's pipes) or that
+    start the process before the test is known (warm pools; see
+    ``judge/runners.py``).  Call :meth:`start_clock` when the measured
+    run begins, then :meth:`wait`.
+    """
+
+    def __init__(self, argv: List[str], limits: Dict[str, float], stdin, stdout, stderr,
+                 pass_fds: tuple = ()) -> None:
+        self.limits = limits
+        parent = _cgroup_parent()
+        self.group = _make_cgroup(parent, limits) if parent is not None else None
+        self.backend = 'cgroup' if self.group is not None else 'rlimit'
+        self.uid = _next_uid()
+        if self.uid is not None:
+            argv = [_sandbox_executable(argv[0])] + list(argv[1:])
+        env = {'PATH': os.environ.get('PATH', '/usr/bin:/bin'), 'LANG': 'C.UTF-8',
+               'PYTHONIOENCODING': 'utf-8', 'PYTHONDONTWRITEBYTECODE': '1'}
+        self.proc = subprocess.Popen(
+            argv, stdin=stdin, stdout=stdout, stderr=stderr, env=env,
+            cwd=tempfile.gettempdir(), close_fds=True, pass_fds=pass_fds,
+            preexec_fn=_make_preexec(limits, self.group, self.uid),
+        )
+        self.started = time.monotonic()
+        self.cpu_baseline = 0.0
+        self._wall_hit = threading.Event()
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def pid(self) -> int:
+        return self.proc.pid
+
+    def _cpu_now(self) -> float:
+        if self.group is not None:
+            return _read_kv(self.group / 'cpu.stat').get('usage_usec', 0) / 1e6
+        return _proc_cpu_time(self.proc.pid)
+
+    def start_clock(self) -> None:
+        """Start the wall-clock deadline and exclude CPU used so far."""
+        self.started = time.monotonic()
+        self.cpu_baseline = self._cpu_now()
+        self._timer = threading.Timer(float(self.limits['wall_time']), self.kill, args=(True,))
+        self._timer.start()
+
+    def kill(self, wall: bool = False) -> None:
+        if wall:
+            self._wall_hit.set()
+        if self.group is not None:
+            _kill_cgroup(self.group)
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    def wait(self, output_size: Optional[Callable[[], int]] = None):
+        """Reap the process.
+
+        Returns ``(returncode, cpu_time, wall_time, memory, killed_by)``.
+        ``output_size``, when given, is called after the process exits and
+        returns the most bytes written to stdout or stderr, for detecting
+        the output limit.
+        """
+        if self._timer is None:
+            self.start_clock()
+        try:
+            # wait4 reaps the child and hands back its rusage in one call,
+            # which is both cheaper and more precise than sampling /proc.
+            _, status, usage = os.wait4(self.proc.pid, 0)
+        finally:
+            self._timer.cancel()
+        wall_time = time.monotonic() - self.started
+        returncode = self.proc.returncode = os.waitstatus_to_exitcode(status)
+        limits = self.limits
+        killed_by: Optional[str] = None
+
+        group = self.group
+        if group is not None:
+            # Take down anything the program forked before reading counters.
+            _kill_cgroup(group)
+            cpu_stat = _read_kv(group / 'cpu.stat')
+            cpu_time = cpu_stat.get('usage_usec', 0) / 1e6
+            memory = _read_kv(group / 'memory.stat').get('anon', 0)
+            peak = group / 'memory.peak'
+            if peak.exists():
+                memory = int(peak.read_text().strip() or 0)
+            events = _read_kv(group / 'memory.events')
+            pid_events = _read_kv(group / 'pids.events')
+            if events.get('oom_kill', 0):
+                killed_by = KILLED_MEMORY
+            elif pid_events.get('max', 0):
+                killed_by = KILLED_PIDS
+            _remove_cgroup(group)
+        else:
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            cpu_time = usage.ru_utime + usage.ru_stime
+            memory = usage.ru_maxrss * 1024
+        cpu_time = max(0.0, cpu_time - self.cpu_baseline)
+
+        if killed_by is None:
+            if cpu_time > float(limits['cpu_time']) or returncode == -signal.SIGXCPU:
+                killed_by = KILLED_CPU
+            elif self._wall_hit.is_set():
+                killed_by = KILLED_WALL
+            elif returncode == -signal.SIGXFSZ or (
+                    output_size is not None and output_size() >= int(limits['output'])):
+                # CPython ignores SIGXFSZ and fails the write instead, so
+                # the file reaching the cap is the reliable signal.
+                killed_by = KILLED_OUTPUT
+            elif self.backend == 'rlimit' and returncode != 0 and memory >= int(limits['memory']) * 0.9:
+                killed_by = KILLED_MEMORY
+        return returncode, cpu_time, wall_time, memory, killed_by
+
+    def discard(self) -> None:
+        """Kill and reap a process that will not be used."""
+        self.kill()
+        try:
+            os.waitpid(self.proc.pid, 0)
+        except ChildProcessError:
+            pass
+        self.proc.returncode = -signal.SIGKILL
+        if self.group is not None:
+            _remove_cgroup(self.group)
+
+
+def collect_result(sandboxed: SandboxProcess, stdout, stderr) -> SandboxResult:
+    """Wait for ``sandboxed`` and read its output from the temp files."""
+    limit = int(sandboxed.limits['output'])
+    returncode, cpu_time, wall_time, memory, killed_by = sandboxed.wait(
+        lambda: max(os.fstat(stdout.fileno()).st_size, os.fstat(stderr.fileno()).st_size),
+    )
+    out = _read_capped(stdout, limit)
+    err = _read_capped(stderr, limit)
+    if sandboxed.backend == 'rlimit' and killed_by is None:
+        if 'MemoryError' in err:
+            killed_by = KILLED_MEMORY
+        elif returncode != 0 and 'BlockingIOError' in err:
+            # fork() failing with EAGAIN under RLIMIT_NPROC.
+            killed_by = KILLED_PIDS
+    return SandboxResult(
+        returncode=returncode, stdout=out, stderr=err,
+        cpu_time=cpu_time, wall_time=wall_time, memory=memory,
+        killed_by=killed_by, backend=sandboxed.backend,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Public entry point
+# ---------------------------------------------------------------------------
+
+def run_sandboxed(argv: List[str], input_data: str = '', **overrides) -> SandboxResult:
+    """Run ``argv`` with ``input_data`` on stdin under the configured limits.
+
+    Keyword arguments override individual entries of ``DEFAULT_LIMITS``
+    (``cpu_time``, ``wall_time``, ``memory``, ``pids``, ``output``,
+    ``cpu_quota``).
+    """
+    limits = get_limits(**overrides)
+    with tempfile.TemporaryFile() as stdin, \
+            tempfile.TemporaryFile() as stdout, \
+            tempfile.TemporaryFile() as stderr:
+        stdin.write(input_data.encode('utf-8'))
+        stdin.seek(0)
+        sandboxed = SandboxProcess(argv, limits, stdin, stdout, stderr)
+        return collect_result(sandboxed, stdout, stderr)
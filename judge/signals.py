@@ -0,0 +1,40 @@
+"""
+Signal handlers for the judge app, connected in ``JudgeConfig.ready``.
+"""
+
+from __future__ import annotations
+
+from django.conf import settings  # type: ignore
+from django.db.backends.signals import connection_created  # type: ignore
+from django.db.models.signals import post_save, pre_delete  # type: ignore
+from django.dispatch import receiver  # type: ignore
+
+from . import similarity
+from .models import Solution
+
+
+@receiver(post_save, sender=Solution)
+def index_solution_fingerprints(sender, instance: Solution, raw: bool = False, **kwargs) -> None:
+    """Keep the similarity index in step with saved solutions."""
+    if raw:  # loaddata: rows may reference objects not loaded yet
+        return
+    similarity.index_solution(instance)
+
+
+@receiver(pre_delete, sender=Solution)
+def forget_solution_fingerprints(sender, instance: Solution, **kwargs) -> None:
+    """Keep the fingerprint frequencies in step with deleted solutions."""
+    similarity.forget(instance)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs) -> None:
+    """Apply ``settings.SQLITE_PRAGMAS`` to each new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
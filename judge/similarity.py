@@ -0,0 +1,286 @@
+"""
+Code similarity index for plagiarism checks.
+
+Each ``Solution`` is reduced to a set of fingerprints with the winnowing
+algorithm (Schleimer, Wilkerson & Aiken, 2003):
+
+1. the code is tokenized and normalised, so renaming variables or
+   changing literals, comments and whitespace does not matter;
+2. every run of ``K`` consecutive tokens is hashed;
+3. from every window of ``W`` consecutive hashes the minimum is kept.
+
+The fingerprints go into an inverted index (``FingerprintPosting``)
+keyed by (problem, hash).  Looking up the solutions similar to one
+solution only touches postings that share at least one of its hashes,
+instead of comparing it with every other solution, and a problem's most
+similar pairs come from a single self-join of its postings.
+
+``FingerprintFrequency`` counts the solutions holding each hash.  Hashes
+held by more than ``COMMON_FRACTION`` of a problem's solutions, or by
+more than ``MAX_POSTINGS`` of them, are boilerplate (``n = int(input())``)
+and ignored at query time.  The cap also bounds the self-join: no hash
+contributes more than ``MAX_POSTINGS ** 2 / 2`` pairs.
+
+The index is updated from ``post_save`` and ``pre_delete`` signals on
+``Solution`` (see ``judge/signals.py``); ``manage.py
+rebuild_similarity_index`` recomputes it using several processes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import keyword
+import token
+import tokenize
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import connection, transaction  # type: ignore
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Value  # type: ignore
+from django.db.models.functions import Cast, Least  # type: ignore
+
+# Model imports are done inside functions so rebuild workers started with
+# the "spawn" method can unpickle _solution_fingerprint without Django
+# having been set up.
+
+K = 5
+W = 4
+COMMON_FRACTION = 0.2
+MIN_COMMON = 3
+MAX_POSTINGS = 50
+
+_SKIP = {token.COMMENT, token.NL, token.NEWLINE, token.INDENT, token.DEDENT,
+         token.ENCODING, token.ENDMARKER}
+
+
+def normalise_tokens(code: str) -> List[str]:
+    """Return a normalised token stream for ``code``.
+
+    Identifiers become ``V``, numbers ``N`` and strings ``S``; keywords
+    and operators are kept.  Code that does not tokenize falls back to a
+    whitespace split so it still gets (weaker) fingerprints.
+    """
+    out: List[str] = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type in _SKIP:
+                continue
+            if tok.type == token.NAME:
+                out.append(tok.string if keyword.iskeyword(tok.string) else 'V')
+            elif tok.type == token.NUMBER:
+                out.append('N')
+            elif tok.type == token.STRING:
+                out.append('S')
+            else:
+                out.append(tok.string)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        out = code.split()
+    return out
+
+
+def _hash(gram: Tuple[str, ...]) -> int:
+    digest = hashlib.blake2b('\x1f'.join(gram).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)  # fits BigIntegerField
+
+
+def fingerprint(code: str, k: int = K, w: int = W) -> Set[int]:
+    """Winnowed fingerprints of ``code``."""
+    tokens = normalise_tokens(code)
+    if len(tokens) < k:
+        return {_hash(tuple(tokens))} if tokens else set()
+    hashes = [_hash(tuple(tokens[i:i + k])) for i in range(len(tokens) - k + 1)]
+    if len(hashes) <= w:
+        return {min(hashes)}
+    picked: Set[int] = set()
+    for i in range(len(hashes) - w + 1):
+        window = hashes[i:i + w]
+        picked.add(min(window))
+    return picked
+
+
+def _solution_fingerprint(args: Tuple[int, str]) -> Tuple[int, Set[int]]:
+    """Worker for parallel rebuilds; module-level so it can be pickled."""
+    solution_id, code = args
+    return solution_id, fingerprint(code)
+
+
+def store(solution, hashes: Iterable[int]) -> None:
+    """Replace the indexed fingerprints of ``solution`` with ``hashes``."""
+    _store(solution.pk, solution.problem_id, hashes)
+
+
+def _store(solution_id: int, problem_id: int, hashes: Iterable[int]) -> bool:
+    """Write only the postings that changed and adjust the frequencies.
+
+    Returns ``False`` if the solution no longer exists.
+    """
+    from .models import FingerprintPosting, Solution, SolutionFingerprint
+
+    hashes = set(hashes)
+    with transaction.atomic():
+        # Locking the solution row serialises the signal handler and
+        # rebuild() when both index the same solution.
+        if not list(Solution.objects.select_for_update().filter(pk=solution_id).values_list('pk')):
+            return False
+        old = set(FingerprintPosting.objects.filter(solution_id=solution_id).values_list('hash', flat=True))
+        FingerprintPosting.objects.filter(solution_id=solution_id, hash__in=old - hashes).delete()
+        FingerprintPosting.objects.bulk_create([
+            FingerprintPosting(problem_id=problem_id, hash=h, solution_id=solution_id)
+            for h in hashes - old
+        ])
+        _count(problem_id, hashes - old, 1)
+        _count(problem_id, old - hashes, -1)
+        SolutionFingerprint.objects.update_or_create(
+            solution_id=solution_id,
+            defaults={'problem_id': problem_id, 'size': len(hashes)},
+        )
+    return True
+
+
+def _count(problem_id: int, hashes: Set[int], delta: int) -> None:
+    from .models import FingerprintFrequency
+
+    if not hashes:
+        return
+    if delta > 0:
+        FingerprintFrequency.objects.bulk_create(
+            [FingerprintFrequency(problem_id=problem_id, hash=h) for h in hashes],
+            ignore_conflicts=True,
+        )
+    rows = FingerprintFrequency.objects.filter(problem_id=problem_id, hash__in=hashes)
+    rows.update(count=F('count') + delta)
+    if delta < 0:
+        rows.filter(count=0).delete()
+
+
+def forget(solution) -> None:
+    """Take ``solution`` out of the frequencies before it is deleted.
+
+    Its postings and ``SolutionFingerprint`` go with it by cascade.
+    """
+    from .models import FingerprintPosting
+
+    hashes = set(FingerprintPosting.objects.filter(solution_id=solution.pk).values_list('hash', flat=True))
+    _count(solution.problem_id, hashes, -1)
+
+
+def index_solution(solution) -> None:
+    store(solution, fingerprint(solution.code))
+
+
+def _common_limit(problem_id: int) -> int:
+    """Solutions per hash above which a hash counts as boilerplate."""
+    from .models import SolutionFingerprint
+
+    total = SolutionFingerprint.objects.filter(problem_id=problem_id).count()
+    return min(MAX_POSTINGS, max(MIN_COMMON, int(total * COMMON_FRACTION)))
+
+
+def similar_to(solution, n: int = 10) -> List[Dict[str, object]]:
+    """Top ``n`` solutions of the same problem most similar to ``solution``.
+
+    Each result has ``solution_id``, ``shared`` (fingerprints in common)
+    and ``score``: shared / size of the smaller fingerprint set, so a
+    solution copied into a longer one still scores 1.0.  Boilerplate
+    hashes are left out of the sizes on both sides.  Candidates are
+    ranked by score in the database, so a short solution contained in
+    this one is not crowded out by longer ones sharing more hashes.
+    """
+    from .models import FingerprintFrequency, FingerprintPosting
+
+    common = (FingerprintFrequency.objects
+              .filter(problem_id=solution.problem_id, count__gt=_common_limit(solution.problem_id))
+              .values('hash'))
+    postings = FingerprintPosting.objects.filter(problem_id=solution.problem_id).exclude(hash__in=common)
+
+    size = postings.filter(solution_id=solution.pk).count()
+    if not size:
+        return []
+    other_size = Subquery(postings.filter(solution_id=OuterRef('solution_id'))
+                          .values('solution_id').annotate(n=Count('id')).values('n'))
+    matches = (
+        postings
+        .filter(hash__in=postings.filter(solution_id=solution.pk).values('hash'))
+        .exclude(solution_id=solution.pk)
+        .values('solution_id')
+        .annotate(shared=Count('id'))
+        .annotate(score=Cast('shared', FloatField()) / Least(other_size, Value(size)))
+        .order_by('-score', '-shared', 'solution_id')[:n]
+    )
+    return [{'solution_id': m['solution_id'], 'shared': m['shared'], 'score': m['score']}
+            for m in matches]
+
+
+_PAIRS_SQL = """
+WITH kept AS (
+    SELECT p.solution_id, p.hash FROM {postings} p
+    JOIN {frequencies} f ON f.problem_id = p.problem_id AND f.hash = p.hash
+    WHERE p.problem_id = %s AND f.count <= %s
+), sizes AS (
+    SELECT solution_id, COUNT(*) AS n FROM kept GROUP BY solution_id
+), pairs AS (
+    SELECT a.solution_id AS first, b.solution_id AS second, COUNT(*) AS shared
+    FROM kept a JOIN kept b ON b.hash = a.hash AND b.solution_id > a.solution_id
+    GROUP BY a.solution_id, b.solution_id
+)
+SELECT first, second, shared,
+       shared * 1.0 / CASE WHEN sa.n < sb.n THEN sa.n ELSE sb.n END AS score
+FROM pairs
+JOIN sizes sa ON sa.solution_id = first
+JOIN sizes sb ON sb.solution_id = second
+ORDER BY score DESC, shared DESC, first, second
+LIMIT %s
+"""
+
+
+def similar_pairs(problem, n: int = 10) -> List[Dict[str, object]]:
+    """Top ``n`` most similar pairs of solutions for ``problem``.
+
+    One grouped self-join of the postings on (problem, hash), skipping
+    boilerplate hashes, so the cost depends on how many fingerprints
+    solutions share rather than on a query per solution.
+    """
+    from .models import FingerprintFrequency, FingerprintPosting
+
+    quote = connection.ops.quote_name
+    sql = _PAIRS_SQL.format(postings=quote(FingerprintPosting._meta.db_table),
+                            frequencies=quote(FingerprintFrequency._meta.db_table))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [problem.pk, _common_limit(problem.pk), n])
+        rows = cursor.fetchall()
+    return [{'pair': (first, second), 'shared': shared, 'score': float(score)}
+            for first, second, shared, score in rows]
+
+
+def rebuild(problem_id=None, workers: int = None, chunk_size: int = 200) -> int:
+    """Recompute fingerprints for all solutions (or one problem's).
+
+    Tokenizing and hashing run in a process pool.  The parent reads the
+    solutions a page at a time and writes each result with the same
+    per-solution replace as ``store()``, so the index stays usable while
+    it is rebuilt.  Returns the number of indexed solutions.
+    """
+    from multiprocessing import Pool
+
+    from .models import Solution
+
+    qs = Solution.objects.order_by('id')
+    if problem_id is not None:
+        qs = qs.filter(problem_id=problem_id)
+
+    count = 0
+    last_id = 0
+    with Pool(processes=workers) as pool:
+        while True:
+            # Pages are fetched here rather than in a generator handed to
+            # the pool, whose feeder thread would open its own connection.
+            page = list(qs.filter(id__gt=last_id).values_list('id', 'problem_id', 'code')[:chunk_size])
+            if not page:
+                break
+            last_id = page[-1][0]
+            problems = {solution_id: pid for solution_id, pid, _ in page}
+            jobs = [(solution_id, code) for solution_id, _, code in page]
+            for solution_id, hashes in pool.imap_unordered(_solution_fingerprint, jobs, chunksize=16):
+                if _store(solution_id, problems[solution_id], hashes):
+                    count += 1
+    return count
@@ -0,0 +1,95 @@
+"""Retention policy and archive/restore round trip (judge.archive)."""
+
+from __future__ import annotations
+
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.contrib.auth import get_user_model  # type: ignore
+from django.test import TestCase  # type: ignore
+from django.utils import timezone  # type: ignore
+
+from judge import archive
+from judge.models import Problem, Solution, Submission, SubmissionProfile, TestCase as JudgeTestCase
+from judge.models import UserProblemStat
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp(prefix='judge-archive-test-'))
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.user = get_user_model().objects.create(username='alice')
+        self.problem = Problem.objects.create(title='Sum', description='')
+        now = timezone.now()
+        self.subs = []
+        for i, passed in enumerate([False, True, False, True, False]):
+            sub = Submission.objects.create(
+                user=self.user, problem=self.problem, code=f'print({i})', passed=passed,
+                output=f'#1 -> {i}', per_test_results={'v': 2, 'case_ids': [], 'verdicts': []},
+            )
+            Submission.objects.filter(pk=sub.pk).update(created_at=now - timedelta(days=10 - i))
+            sub.refresh_from_db()
+            self.subs.append(sub)
+        # The oldest submission is referenced by a solution, so it is kept.
+        Solution.objects.create(user=self.user, problem=self.problem,
+                                submission=self.subs[0], code=self.subs[0].code)
+        UserProblemStat.objects.create(user=self.user, problem=self.problem, attempts=5, passed=True)
+
+    def test_retention_policy(self):
+        # Kept: the latest (4), the latest passing (3) and the solution's (0).
+        self.assertEqual(sorted(archive.select_archivable()), [self.subs[1].pk, self.subs[2].pk])
+        cutoff = self.subs[2].created_at
+        self.assertEqual(list(archive.select_archivable(cutoff)), [self.subs[1].pk])
+
+    def test_round_trip(self):
+        ids = archive.select_archivable()
+        moved = archive.archive_submissions(ids, self.directory, batch_size=1, prefix='t')
+        self.assertEqual(moved, 2)
+        files = sorted(self.directory.iterdir())
+        self.assertEqual(len(files), 2)
+        self.assertFalse(Submission.objects.filter(pk__in=list(ids)).exists())
+        self.assertEqual(UserProblemStat.objects.get().attempts, 5)
+
+        restored = sum(archive.restore_archive(path) for path in files)
+        self.assertEqual(restored, 2)
+        for original in (self.subs[1], self.subs[2]):
+            copy = Submission.objects.get(pk=original.pk)
+            for field in archive.ARCHIVED_FIELDS:
+                self.assertEqual(getattr(copy, field),
+                                 getattr(original, field), field)
+
+        # Restoring again does not duplicate rows.
+        self.assertEqual(sum(archive.restore_archive(path) for path in files), 0)
+
+    def test_profile_round_trip(self):
+        case = JudgeTestCase.objects.create(problem=self.problem, input_data='1', expected_output='1')
+        profile = SubmissionProfile.objects.create(
+            submission=self.subs[1], test_case=case, status=SubmissionProfile.DONE,
+            data={'samples': 3, 'functions': [], 'lines': []},
+        )
+        ids = archive.select_archivable()
+        archive.archive_submissions(ids, self.directory, prefix='t')
+        self.assertFalse(SubmissionProfile.objects.exists())
+        path, = self.directory.iterdir()
+        self.assertEqual(archive.restore_archive(path), 2)
+        copy = SubmissionProfile.objects.get(submission_id=self.subs[1].pk)
+        for field in archive.PROFILE_FIELDS:
+            self.assertEqual(getattr(copy, field), getattr(profile, field), field)
+        self.assertFalse(SubmissionProfile.objects.filter(submission_id=self.subs[2].pk).exists())
+
+    def test_dry_run_keeps_rows(self):
+        ids = archive.select_archivable()
+        self.assertEqual(archive.archive_submissions(ids, self.directory, dry_run=True), 2)
+        self.assertEqual(list(self.directory.iterdir()), [])
+        self.assertEqual(Submission.objects.count(), 5)
+
+    def test_restore_skips_deleted_problem(self):
+        ids = archive.select_archivable()
+        archive.archive_submissions(ids, self.directory, prefix='t')
+        path, = self.directory.iterdir()
+        self.assertEqual([row['id'] for row in archive.read_archive(path)], sorted(ids))
+        self.problem.delete()
+        self.assertEqual(archive.restore_archive(path), 0)
@@ -0,0 +1,89 @@
+"""Static checks run before judging (judge.precheck)."""
+
+from __future__ import annotations
+
+from django.core.cache import cache  # type: ignore
+from django.test import SimpleTestCase, override_settings  # type: ignore
+
+from judge import precheck, results
+from judge.models import Problem, TestCase
+
+
+class PrecheckTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.problem = Problem(title='Echo', description='', forbidden_imports='os, subprocess',
+                               requires_input=True)
+        self.cases = [TestCase(input_data='5\n', expected_output='5')]
+
+    def check(self, code, problem=None, cases=None):
+        return precheck.run_prechecks(code, problem or self.problem,
+                                      self.cases if cases is None else cases)
+
+    def test_accepts_plain_solution(self):
+        self.assertIsNone(self.check('print(input())'))
+
+    def test_syntax_error(self):
+        verdict, message = self.check('print(input(')
+        self.assertEqual(verdict, results.VERDICT_COMPILE_ERROR)
+        self.assertTrue(message.startswith('Line 1'))
+
+    def test_forbidden_imports(self):
+        for code in ('import os\nprint(input())',
+                     'import os.path\nprint(input())',
+                     'from subprocess import run\nprint(input())',
+                     "__import__('os')\nprint(input())",
+                     "import importlib\nimportlib.import_module('os')\nprint(input())"):
+            with self.subTest(code=code):
+                verdict, message = self.check(code)
+                self.assertEqual(verdict, results.VERDICT_REJECTED)
+                self.assertIn('not allowed', message)
+
+    def test_allowed_and_relative_imports(self):
+        self.assertIsNone(self.check('import sys\nprint(sys.stdin.read())'))
+        self.assertIsNone(self.check('from .os import x\nprint(input())'))
+
+    def test_must_read_input(self):
+        verdict, _ = self.check('print(5)')
+        self.assertEqual(verdict, results.VERDICT_REJECTED)
+        for code in ('import sys\nprint(sys.stdin.read())', 'print(open(0).read())',
+                     'import fileinput\nprint(*fileinput.input())'):
+            with self.subTest(code=code):
+                self.assertIsNone(self.check(code))
+
+    def test_input_rule_needs_input_and_flag(self):
+        self.assertIsNone(self.check('print(5)', cases=[TestCase(input_data='', expected_output='5')]))
+        self.problem.requires_input = False
+        self.assertIsNone(self.check('print(5)'))
+
+    def test_too_deeply_nested(self):
+        verdict, _ = self.check('x = ' + '+'.join(['1'] * 30000))
+        self.assertEqual(verdict, results.VERDICT_COMPILE_ERROR)
+
+    @override_settings(JUDGE_PRECHECK_MAX_CODE_SIZE=100)
+    def test_size_cap(self):
+        verdict, message = self.check('print(input())  # ' + 'x' * 100)
+        self.assertEqual(verdict, results.VERDICT_REJECTED)
+        self.assertIn('100', message)
+
+    @override_settings(JUDGE_PRECHECKS=[])
+    def test_checks_come_from_settings(self):
+        self.assertIsNone(self.check('import os'))
+
+    @override_settings(JUDGE_PRECHECKS=['judge.tests.test_precheck.reject_everything'])
+    def test_outcome_is_cached(self):
+        calls.clear()
+        self.assertEqual(self.check('print(input())'), (results.VERDICT_REJECTED, 'no'))
+        self.assertEqual(self.check('print(input())'), (results.VERDICT_REJECTED, 'no'))
+        self.assertEqual(len(calls), 1)
+        self.check('print(input() * 2)')
+        self.assertEqual(len(calls), 2)
+
+
+calls = []
+
+
+def reject_everything(tree, problem, test_cases):
+    calls.append(tree)
+    return 'no'
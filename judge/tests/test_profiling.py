@@ -0,0 +1,105 @@
+"""Sampling profiles of submissions (judge.profiling)."""
+
+from __future__ import annotations
+
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase  # type: ignore
+
+from judge import profiling, results
+from judge.models import Problem, Submission, SubmissionProfile
+from judge.models import TestCase as JudgeTestCase
+
+HOT_LOOP = '''def slow(n):
+    total = 0
+    for i in range(n):
+        total += i % 7
+    return total
+
+slow(10 ** 9)
+'''
+
+FORGER = '''import os
+for fd in range(3, 64):
+    try:
+        os.write(fd, b'{"samples": 1, "truncated": false, "functions": [[1]], "lines": []}')
+    except OSError:
+        pass
+'''
+
+
+class ProfileCodeTests(SimpleTestCase):
+
+    def test_hot_line_found_and_budget_respected(self):
+        with self.settings(JUDGE_PROFILING={'budget': 0.5}):
+            report = profiling.profile_code(HOT_LOOP, '')
+        self.assertTrue(report['truncated'])
+        self.assertEqual(report['functions'][0][:2], ['slow', 1])
+        self.assertIn(report['lines'][0][0], (3, 4))
+
+    def test_forged_report_is_rejected(self):
+        with self.assertRaises(ValueError):
+            profiling.profile_code(FORGER, '')
+
+    def test_oversized_report_is_rejected(self):
+        flood = "import os\nfor fd in range(3, 64):\n    try: os.write(fd, b'x' * 200000)\n    except OSError: pass\n"
+        with self.assertRaises(ValueError):
+            profiling.profile_code(flood, '')
+
+
+class ReportTests(SimpleTestCase):
+
+    def test_validate_report(self):
+        good = {'samples': 4, 'truncated': False, 'functions': [['f', 1, 3, 4]], 'lines': [[2, 3]]}
+        self.assertEqual(profiling.validate_report(good, top=10)['functions'], [['f', 1, 3, 4]])
+        for bad in ([], dict(good, samples=-1), dict(good, functions=[[1]]),
+                    dict(good, lines=[['2', 3]]), dict(good, truncated='no')):
+            with self.subTest(bad=bad), self.assertRaises(ValueError):
+                profiling.validate_report(bad, top=10)
+        with self.assertRaises(ValueError):
+            profiling.validate_report(dict(good, lines=[[1, 1]] * 11), top=10)
+
+    def test_annotate_skips_malformed_rows(self):
+        data = {'samples': 4, 'interval': 0.005, 'functions': [[1], ['f', 1, 2, 4]],
+                'lines': [[2, 2], 'x']}
+        report = profiling.annotate(data, 'def f():\n    pass\n')
+        self.assertEqual([f['name'] for f in report['functions']], ['f'])
+        self.assertEqual(report['functions'][0]['total_pct'], 100.0)
+        self.assertEqual(report['lines'], [{'line': 2, 'count': 2, 'pct': 50.0, 'text': 'pass'}])
+        self.assertEqual(profiling.annotate({'samples': 'x'}, '')['samples'], 0)
+
+
+class RunProfileTests(TestCase):
+
+    def setUp(self):
+        self.problem = Problem.objects.create(title='Loop', description='')
+        case = JudgeTestCase.objects.create(problem=self.problem, input_data='', expected_output='1')
+        self.submission = Submission.objects.create(
+            problem=self.problem, code='print(2)', passed=False,
+            per_test_results=results.encode([{'case_id': case.pk, 'verdict': results.VERDICT_WRONG_ANSWER,
+                                              'actual': '2', 'stderr': '', 'returncode': 0}]),
+        )
+        self.profile = SubmissionProfile.objects.create(submission=self.submission)
+
+    def test_done(self):
+        profiling.run_profile(self.profile.pk)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.status, SubmissionProfile.DONE)
+        self.assertIsNotNone(self.profile.test_case_id)
+
+    def test_unexpected_error_marks_failed(self):
+        with mock.patch.object(profiling, 'SandboxProcess', side_effect=OSError('fork failed')), \
+                self.assertLogs('judge.profiling', 'ERROR'):
+            profiling.run_profile(self.profile.pk)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.status, SubmissionProfile.FAILED)
+        self.assertTrue(self.profile.message)
+
+    def test_interactive_problems_are_not_profiled(self):
+        self.problem.interactor = 'import sys\nsys.exit(0)'
+        self.problem.save()
+        self.submission.refresh_from_db()
+        self.assertFalse(profiling.is_profilable(self.submission))
+        profiling.run_profile(self.profile.pk)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.status, SubmissionProfile.FAILED)
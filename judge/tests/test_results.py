@@ -0,0 +1,131 @@
+"""Compact per-test results (judge.results) and the 0006 data migration."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from django.db import connection  # type: ignore
+from django.db.migrations.executor import MigrationExecutor  # type: ignore
+from django.test import SimpleTestCase, TransactionTestCase  # type: ignore
+
+from judge import results
+
+
+def case(pk, input_data, expected_output):
+    return SimpleNamespace(pk=pk, input_data=input_data, expected_output=expected_output)
+
+
+def legacy_row(index, input_data, expected, actual, passed, stderr='', returncode=0):
+    return {'index': index, 'input': input_data, 'expected': expected, 'actual': actual,
+            'passed': passed, 'stderr': stderr, 'returncode': returncode}
+
+
+class EncodeDecodeTests(SimpleTestCase):
+    rows = [
+        {'case_id': 1, 'verdict': results.VERDICT_ACCEPTED, 'actual': '4', 'stderr': '',
+         'returncode': 0, 'time': 0.021, 'memory': 9 * 1024 * 1024},
+        {'case_id': 2, 'verdict': results.VERDICT_TIME_LIMIT, 'actual': '', 'stderr': 'Time limit exceeded',
+         'returncode': None, 'time': 2.0, 'memory': None},
+    ]
+    cases = {1: case(1, '2', '4\n'), 2: case(2, '3', '9')}
+
+    def test_round_trip(self):
+        data = results.encode(self.rows, compress=False)
+        self.assertTrue(results.is_compact(data))
+        self.assertEqual(results.referenced_case_ids(data), [1, 2])
+        decoded = results.decode(data, self.cases)
+        self.assertEqual([r['verdict'] for r in decoded], ['AC', 'TLE'])
+        self.assertEqual(decoded[0]['expected'], '4')
+        self.assertEqual(decoded[0]['time'], 0.021)
+        self.assertEqual(decoded[0]['memory'], 9 * 1024 * 1024)
+        self.assertTrue(decoded[0]['passed'])
+        self.assertEqual(decoded[1]['stderr'], 'Time limit exceeded')
+
+    def test_compressed_round_trip(self):
+        rows = [dict(self.rows[0], actual='x' * 500)]
+        data = results.encode(rows, compress=True)
+        self.assertIn('z', data)
+        self.assertEqual(results.decode(data, self.cases)[0]['actual'], 'x' * 500)
+
+    def test_text_is_truncated(self):
+        data = results.encode([dict(self.rows[0], actual='y' * 50)], text_limit=10, compress=False)
+        self.assertTrue(data['actual'][0].startswith('y' * 10 + '...'))
+
+    def test_removed_case(self):
+        decoded = results.decode(results.encode(self.rows, compress=False), {})
+        self.assertEqual(decoded[0]['expected'], '(test case removed)')
+
+    def test_legacy_rows_pass_through(self):
+        legacy = [legacy_row(1, '2', '4', '5', False)]
+        decoded = results.decode(legacy, {})
+        self.assertEqual(decoded[0]['verdict'], results.VERDICT_WRONG_ANSWER)
+        self.assertEqual(decoded[0]['expected'], '4')
+
+
+class FromLegacyTests(SimpleTestCase):
+
+    def test_matching_cases_are_referenced(self):
+        cases = [case(10, '2', '4\n'), case(11, '3', '9')]
+        rows = [legacy_row(1, '2', '4', '4', True), legacy_row(2, '3', '9', '', False, 'boom', 1)]
+        data = results.from_legacy(rows, cases, compress=False)
+        self.assertEqual(data['case_ids'], [10, 11])
+        self.assertEqual(data['verdicts'], ['AC', 'RE'])
+
+    def test_case_found_after_reordering(self):
+        # A case was inserted before the original first one.
+        cases = [case(9, '1', '1'), case(10, '2', '4')]
+        data = results.from_legacy([legacy_row(1, '2', '4', '4', True)], cases, compress=False)
+        self.assertEqual(data['case_ids'], [10])
+
+    def test_edited_case_keeps_legacy_row(self):
+        cases = [case(10, '2', 'changed')]
+        self.assertIsNone(results.from_legacy([legacy_row(1, '2', '4', '4', True)], cases))
+
+    def test_deleted_case_keeps_legacy_row(self):
+        self.assertIsNone(results.from_legacy([legacy_row(2, '3', '9', '9', True)], [case(10, '2', '4')]))
+
+
+class CompactResultsMigrationTests(TransactionTestCase):
+    before = [('judge', '0005_alter_userproblemstat_unique_together')]
+    after = [('judge', '0006_compact_per_test_results')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_forward_and_reverse(self):
+        apps = self.migrate(self.before)
+        Problem = apps.get_model('judge', 'Problem')
+        TestCase = apps.get_model('judge', 'TestCase')
+        Submission = apps.get_model('judge', 'Submission')
+        problem = Problem.objects.create(title='Square', description='')
+        first = TestCase.objects.create(problem=problem, input_data='2', expected_output='4')
+        TestCase.objects.create(problem=problem, input_data='3', expected_output='9')
+        current = Submission.objects.create(problem=problem, code='', per_test_results=[
+            legacy_row(1, '2', '4', '4', True), legacy_row(2, '3', '9', '8', False),
+        ])
+        stale = Submission.objects.create(problem=problem, code='', per_test_results=[
+            legacy_row(1, '2', 'old answer', '4', False),
+        ])
+
+        apps = self.migrate(self.after)
+        Submission = apps.get_model('judge', 'Submission')
+        compact = Submission.objects.get(pk=current.pk).per_test_results
+        self.assertTrue(results.is_compact(compact))
+        self.assertEqual(compact['case_ids'][0], first.pk)
+        self.assertEqual(compact['verdicts'], ['AC', 'WA'])
+        # Its expected output no longer matches any test: left as it was.
+        self.assertEqual(Submission.objects.get(pk=stale.pk).per_test_results[0]['expected'], 'old answer')
+
+        apps = self.migrate(self.before)
+        Submission = apps.get_model('judge', 'Submission')
+        expanded = Submission.objects.get(pk=current.pk).per_test_results
+        self.assertEqual(expanded[0], legacy_row(1, '2', '4', '4', True))
+        self.assertEqual(expanded[1]['expected'], '9')
+        self.assertFalse(expanded[1]['passed'])
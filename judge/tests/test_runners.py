@@ -0,0 +1,193 @@
+"""Runner registry, warm pool and interactive mode (judge.runners)."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings  # type: ignore
+
+from judge import runners
+from judge.sandbox import KILLED_CPU
+
+GUESSER = '''
+lo, hi = 1, 1000
+while True:
+    input()
+    mid = (lo + hi) // 2
+    print(mid, flush=True)
+    reply = input()
+    if reply == '=':
+        break
+    if reply == '<':
+        lo = mid + 1
+    else:
+        hi = mid - 1
+'''
+
+INTERACTOR = '''
+import os, sys
+secret = int(open(sys.argv[1]).read())
+if 'DJANGO_SECRET_KEY' in os.environ:
+    sys.exit('saw the web process environment')
+for _ in range(12):
+    print('?', flush=True)
+    guess = int(input())
+    if guess == secret:
+        print('=', flush=True)
+        sys.exit(0)
+    print('<' if guess < secret else '>', flush=True)
+sys.exit('too many guesses')
+'''
+
+
+# Looks for the test input (a file holding just a number) anywhere it
+# could be reached by name, including other processes' open files, and
+# sends it as the first guess.
+CHEATER = '''
+import glob, os
+def peek(path):
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            return os.read(fd, 64).decode().strip()
+        finally:
+            os.close(fd)
+    except (OSError, UnicodeDecodeError):
+        return ''
+found = '0'
+paths = []
+for cmdline in glob.glob('/proc/[0-9]*/cmdline'):
+    try:
+        paths += open(cmdline, 'rb').read().decode(errors='replace').split('\\0')
+    except OSError:
+        pass
+paths = [p for p in paths if p.endswith('.in')] + glob.glob('/tmp/**/*.in', recursive=True)
+paths += glob.glob('/proc/[0-9]*/fd/*')
+for path in paths:
+    text = peek(path)
+    if text.isdigit() and text != '0':
+        found = text
+        break
+input()
+print(found, flush=True)
+print('?' if input() != '=' else 'done')
+'''
+
+
+class SourceMixin:
+
+    def source(self, code: str, runner=None) -> Path:
+        path = runners.write_source(code, runner or runners.get_runner('python3'))
+        self.addCleanup(path.unlink, missing_ok=True)
+        return path
+
+
+class RegistryTests(SimpleTestCase):
+
+    def test_unknown_language(self):
+        with self.assertRaises(ValueError):
+            runners.get_runner('cobol')
+
+    def test_missing_runtime_falls_back(self):
+        problem = SimpleNamespace(language='pypy3', time_multiplier=1.0)
+        with mock.patch.object(runners.PyPyRunner, 'available', return_value=False):
+            self.assertNotEqual(runners.runner_for(problem).language, 'pypy3')
+            self.assertEqual(runners.fastest_runner(), runners.get_runner('python3-warm'))
+
+    @override_settings(JUDGE_RUNNERS={'python3': {'time_multiplier': 2.0}})
+    def test_time_multipliers(self):
+        limits = runners.get_runner('python3').limits(SimpleNamespace(time_multiplier=1.5), cpu_time=1, wall_time=2)
+        self.assertEqual(limits['cpu_time'], 3.0)
+        self.assertEqual(limits['wall_time'], 6.0)
+
+    def test_choices_include_auto(self):
+        self.assertEqual(runners.language_choices()[0][0], runners.AUTO)
+
+
+class WarmPoolTests(SourceMixin, SimpleTestCase):
+
+    def setUp(self):
+        self.runner = runners.get_runner('python3-warm')
+        self.addCleanup(self.runner.shutdown)
+        self.limits = self.runner.limits(cpu_time=1, wall_time=5)
+
+    def test_runs_with_input_and_refills(self):
+        source = self.source('import sys\nprint(sum(map(int, sys.stdin.read().split())))')
+        for numbers, total in (('1 2 3', '6'), ('10 20', '30')):
+            result = self.runner.run(source, numbers, self.limits)
+            self.assertEqual((result.returncode, result.stdout.strip()), (0, total))
+        pool = self.runner._pools[tuple(sorted(self.limits.items()))]
+        self.assertEqual(len(pool), self.runner.pool_size)
+
+    def test_runs_as_main(self):
+        result = self.runner.run(self.source('print(__name__)'), '', self.limits)
+        self.assertEqual(result.stdout.strip(), '__main__')
+
+    def test_traceback_is_trimmed_to_submission(self):
+        source = self.source('def f():\n    return 1 / 0\nf()\n')
+        result = self.runner.run(source, '', self.limits)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn('ZeroDivisionError', result.stderr)
+        self.assertIn(str(source), result.stderr)
+        self.assertNotIn('<string>', result.stderr)
+
+    def test_boot_time_not_counted(self):
+        result = self.runner.run(self.source('pass'), '', self.limits)
+        self.assertLess(result.cpu_time, 0.5)
+
+    def test_time_limit(self):
+        result = self.runner.run(self.source('while True: pass'), '', self.limits)
+        self.assertEqual(result.killed_by, KILLED_CPU)
+
+
+class InteractiveTests(SourceMixin, SimpleTestCase):
+
+    def setUp(self):
+        self.runner = runners.get_runner('python3')
+        self.limits = self.runner.limits(cpu_time=1, wall_time=2)
+        self.interactor = INTERACTOR
+
+    def test_accepted(self):
+        with mock.patch.dict('os.environ', {'DJANGO_SECRET_KEY': 'hunter2'}):
+            outcome = runners.run_interactive(self.runner, self.source(GUESSER), self.interactor,
+                                              '377', self.limits)
+        self.assertTrue(outcome.accepted, outcome.message)
+        self.assertEqual(outcome.result.returncode, 0)
+
+    def test_submission_cannot_read_the_test_input(self):
+        outcome = runners.run_interactive(self.runner, self.source(CHEATER), self.interactor,
+                                          '377', self.limits)
+        self.assertFalse(outcome.accepted)
+
+    def test_rejected_with_message(self):
+        linear = 'for guess in range(1, 1001):\n    input()\n    print(guess, flush=True)\n    input()\n'
+        outcome = runners.run_interactive(self.runner, self.source(linear),
+                                          self.interactor, '999', self.limits)
+        self.assertFalse(outcome.accepted)
+        self.assertEqual(outcome.message, 'too many guesses')
+
+    def test_silent_submission_ends_by_wall_clock(self):
+        outcome = runners.run_interactive(self.runner, self.source('import time\ntime.sleep(60)'),
+                                          self.interactor, '1', self.limits)
+        self.assertFalse(outcome.accepted)
+        self.assertIsNotNone(outcome.result.killed_by)
+
+    def test_interactor_is_reaped_when_spawn_fails(self):
+        sleeper = 'import time\ntime.sleep(60)'
+        started = []
+        real_init = runners.SandboxProcess.__init__
+
+        def record(proc, *args, **kwargs):
+            real_init(proc, *args, **kwargs)
+            started.append(proc)
+
+        with mock.patch.object(runners.SandboxProcess, '__init__', record), \
+                mock.patch.object(self.runner, 'spawn', side_effect=OSError('no runtime')):
+            with self.assertRaises(OSError):
+                runners.run_interactive(self.runner, self.source(sleeper), sleeper, '1', self.limits)
+        self.assertEqual(len(started), 1)
+        with self.assertRaises(ChildProcessError):
+            os.waitpid(started[0].pid, os.WNOHANG)
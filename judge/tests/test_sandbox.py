@@ -0,0 +1,62 @@
+"""Kill-reason detection in judge.sandbox."""
+
+from __future__ import annotations
+
+from unittest import mock
+
+from django.test import SimpleTestCase  # type: ignore
+
+from judge.sandbox import (
+    KILLED_CPU, KILLED_MEMORY, KILLED_OUTPUT, KILLED_PIDS, KILLED_WALL, run_sandboxed,
+)
+
+# Resolved from PATH the way the runners do.
+PYTHON = 'python3'
+
+
+def run(code: str, input_data: str = '', **limits):
+    return run_sandboxed([PYTHON, '-c', code], input_data, **limits)
+
+
+class SandboxTests(SimpleTestCase):
+
+    def test_normal_run(self):
+        result = run('print(input()[::-1])', 'abc\n')
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout.strip(), 'cba')
+        self.assertIsNone(result.killed_by)
+        self.assertEqual(result.kill_message, '')
+
+    def test_runtime_error_is_not_a_kill(self):
+        result = run('raise SystemExit(3)')
+        self.assertEqual(result.returncode, 3)
+        self.assertIsNone(result.killed_by)
+
+    def test_cpu_limit(self):
+        result = run('while True: pass', cpu_time=0.5, wall_time=10)
+        self.assertEqual(result.killed_by, KILLED_CPU)
+        self.assertEqual(result.kill_message, 'Time limit exceeded')
+
+    def test_wall_limit(self):
+        result = run('import time; time.sleep(30)', cpu_time=5, wall_time=0.5)
+        self.assertEqual(result.killed_by, KILLED_WALL)
+        self.assertLess(result.wall_time, 10)
+
+    def test_output_limit(self):
+        result = run("import sys\nwhile True: sys.stdout.write('x' * 4096)", output=64 * 1024)
+        self.assertEqual(result.killed_by, KILLED_OUTPUT)
+        self.assertLessEqual(len(result.stdout), 64 * 1024)
+
+    def test_memory_limit(self):
+        result = run('x = bytearray(512 * 1024 * 1024)', memory=64 * 1024 * 1024)
+        self.assertEqual(result.killed_by, KILLED_MEMORY)
+
+    def test_fork_bomb(self):
+        result = run('import os\nwhile True: os.fork()', pids=8, wall_time=5)
+        self.assertEqual(result.killed_by, KILLED_PIDS)
+        self.assertLess(result.wall_time, 5)
+
+    def test_environment_is_scrubbed(self):
+        with mock.patch.dict('os.environ', {'DJANGO_SECRET_KEY': 'hunter2'}):
+            result = run("import os; print(os.environ.get('DJANGO_SECRET_KEY'))")
+        self.assertEqual(result.stdout.strip(), 'None')
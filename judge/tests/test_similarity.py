@@ -0,0 +1,138 @@
+"""Winnowing fingerprints and the similarity index (judge.similarity)."""
+
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model  # type: ignore
+from django.db import connection  # type: ignore
+from django.test import TestCase  # type: ignore
+from django.test.utils import CaptureQueriesContext  # type: ignore
+
+from judge import similarity
+from judge.models import FingerprintFrequency, Problem, Solution, SolutionFingerprint, Submission
+
+ORIGINAL = '''
+n = int(input())
+total = 0
+for i in range(n):
+    if i % 3 == 0 or i % 5 == 0:
+        total += i * i
+    while total > 1000:
+        total -= 7
+print(total)
+'''
+
+RENAMED = '''
+count = int(input())
+acc = 0  # same thing, different names
+for k in range(count):
+    if k % 4 == 0 or k % 9 == 0:
+        acc += k * k
+    while acc > 50:
+        acc -= 2
+print(acc)
+'''
+
+UNRELATED = '''
+import sys
+words = sys.stdin.read().split()
+seen = {}
+for w in words:
+    seen[w] = seen.get(w, 0) + 1
+print(max(seen.items(), key=lambda kv: kv[1])[0])
+'''
+
+
+class FingerprintTests(TestCase):
+
+    def test_ignores_names_literals_and_comments(self):
+        self.assertEqual(similarity.fingerprint(ORIGINAL), similarity.fingerprint(RENAMED))
+
+    def test_different_code_differs(self):
+        self.assertFalse(similarity.fingerprint(ORIGINAL) & similarity.fingerprint(UNRELATED))
+
+
+class IndexTests(TestCase):
+
+    def setUp(self):
+        self.problem = Problem.objects.create(title='Sum', description='')
+        self.solutions = [self.add(name, code) for name, code in
+                          (('a', ORIGINAL), ('b', RENAMED), ('c', UNRELATED))]
+
+    def add(self, username, code):
+        user = get_user_model().objects.create(username=username)
+        submission = Submission.objects.create(user=user, problem=self.problem, code=code, passed=True)
+        # Indexed by the post_save signal.
+        return Solution.objects.create(user=user, problem=self.problem, submission=submission, code=code)
+
+    def test_similar_to(self):
+        a, b, c = self.solutions
+        matches = similarity.similar_to(a)
+        self.assertEqual(matches[0]['solution_id'], b.pk)
+        self.assertEqual(matches[0]['score'], 1.0)
+        self.assertNotIn(c.pk, [m['solution_id'] for m in matches])
+
+    def test_pairs_in_one_query_and_consistent_with_similar_to(self):
+        a, b, _ = self.solutions
+        with CaptureQueriesContext(connection) as queries:
+            pairs = similarity.similar_pairs(self.problem)
+        self.assertLessEqual(len(queries), 2)
+        self.assertEqual(pairs[0]['pair'], (a.pk, b.pk))
+        self.assertEqual(pairs[0]['score'], similarity.similar_to(a)[0]['score'])
+
+    def test_boilerplate_is_ignored(self):
+        for i in range(3):
+            self.add(f'd{i}', ORIGINAL + f'print({i})\n')
+        # The shared body now occurs in most solutions and stops counting.
+        a, b, _ = self.solutions
+        self.assertEqual(similarity.similar_to(a), [])
+        self.assertFalse([p for p in similarity.similar_pairs(self.problem) if a.pk in p['pair']])
+
+    def frequencies(self):
+        return dict(FingerprintFrequency.objects.filter(problem=self.problem).values_list('hash', 'count'))
+
+    def test_frequencies_follow_the_postings(self):
+        a, b, c = self.solutions
+        shared = similarity.fingerprint(ORIGINAL)
+        self.assertEqual({h: self.frequencies()[h] for h in shared}, dict.fromkeys(shared, 2))
+        similarity.store(b, {1, 2})
+        counts = self.frequencies()
+        self.assertEqual((counts[1], counts[2]), (1, 1))
+        self.assertEqual({h: counts[h] for h in shared}, dict.fromkeys(shared, 1))
+        a.delete()
+        self.assertFalse(set(self.frequencies()) & shared)
+
+    def test_ranked_by_score_not_by_shared_count(self):
+        a, b, c = self.solutions
+        similarity.store(a, range(40))
+        similarity.store(b, range(3))  # contained in a: score 1.0
+        similarity.store(c, [])
+        for k in range(4):
+            # Each shares 8 of a's 40 hashes: more in common, but 0.2.
+            longer = self.add(f'l{k}', UNRELATED)
+            similarity.store(longer, list(range(3 + 8 * k, 11 + 8 * k)) + list(range(100 * (k + 1), 100 * (k + 1) + 50)))
+        best, = similarity.similar_to(a, n=1)
+        self.assertEqual((best['solution_id'], best['shared'], best['score']), (b.pk, 3, 1.0))
+
+    def test_hashes_over_the_posting_cap_are_ignored(self):
+        a, b, c = self.solutions
+        with mock.patch.object(similarity, 'MAX_POSTINGS', 1):
+            self.assertEqual(similarity.similar_to(a), [])
+            self.assertEqual(similarity.similar_pairs(self.problem), [])
+
+    def test_rebuild(self):
+        a, b, c = self.solutions
+        # Stale entries, as after a change to K or W.
+        similarity.store(a, {1, 2, 3})
+        similarity.store(c, set())
+        self.assertEqual(similarity.rebuild(workers=2, chunk_size=2), 3)
+        for solution in self.solutions:
+            hashes = similarity.fingerprint(solution.code)
+            self.assertEqual(set(solution.postings.values_list('hash', flat=True)), hashes)
+            self.assertEqual(SolutionFingerprint.objects.get(solution=solution).size, len(hashes))
+        expected = {}
+        for solution in self.solutions:
+            for h in similarity.fingerprint(solution.code):
+                expected[h] = expected.get(h, 0) + 1
+        self.assertEqual(self.frequencies(), expected)
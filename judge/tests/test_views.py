@@ -0,0 +1,101 @@
+"""The async views, driven through ``AsyncClient`` (judge.views)."""
+
+from __future__ import annotations
+
+from django.contrib.auth import get_user_model  # type: ignore
+from django.test import TestCase  # type: ignore
+from django.urls import reverse  # type: ignore
+
+from judge import results
+from judge.models import Problem, Solution, Submission, TestCase as JudgeTestCase
+from judge.models import UserProblemStat
+
+ADD = 'a, b = map(int, input().split())\nprint(a + b)\n'
+
+
+class ViewTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='pw')
+        self.problem = Problem.objects.create(title='Sum', description='Add two numbers.')
+        JudgeTestCase.objects.create(problem=self.problem, input_data='1 2\n', expected_output='3\n')
+        JudgeTestCase.objects.create(problem=self.problem, input_data='5 5\n', expected_output='10\n')
+
+    async def test_problem_list(self):
+        response = await self.async_client.get(reverse('problem_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Sum')
+
+    async def test_problem_detail(self):
+        response = await self.async_client.get(reverse('problem_detail', args=[self.problem.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Add two numbers.')
+
+    async def test_missing_objects_are_404(self):
+        for name in ('problem_detail', 'submission_detail'):
+            response = await self.async_client.get(reverse(name, args=[9999]))
+            self.assertEqual(response.status_code, 404, name)
+
+    async def test_login_required(self):
+        url = reverse('my_progress')
+        response = await self.async_client.get(url)
+        self.assertRedirects(response, f"{reverse('login')}?next={url}", fetch_redirect_response=False)
+        url = reverse('problem_detail', args=[self.problem.pk])
+        response = await self.async_client.post(url, {'code': ADD})
+        self.assertRedirects(response, f"{reverse('login')}?next={url}", fetch_redirect_response=False)
+        self.assertFalse(await Submission.objects.aexists())
+
+    async def test_accepted_submission(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse('problem_detail', args=[self.problem.pk]), {'code': ADD})
+        submission = await Submission.objects.aget()
+        self.assertRedirects(response, reverse('submission_detail', args=[submission.pk]),
+                             fetch_redirect_response=False)
+        self.assertTrue(submission.passed)
+        self.assertEqual(submission.output, '#1 -> 3\n#2 -> 10')
+        self.assertTrue(await Solution.objects.filter(user=self.user, problem=self.problem).aexists())
+        stat = await UserProblemStat.objects.aget(user=self.user, problem=self.problem)
+        self.assertEqual((stat.attempts, stat.passed), (1, True))
+
+        response = await self.async_client.get(reverse('submission_detail', args=[submission.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'All tests passed')
+
+    async def test_wrong_answer_submission(self):
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.post(
+            reverse('problem_detail', args=[self.problem.pk]), {'code': 'input()\nprint(3)\n'})
+        submission = await Submission.objects.aget()
+        self.assertFalse(submission.passed)
+        verdicts = [r['verdict'] for r in await submission.atest_results()]
+        self.assertEqual(verdicts, [results.VERDICT_ACCEPTED, results.VERDICT_WRONG_ANSWER])
+        self.assertFalse(await Solution.objects.aexists())
+
+    async def test_precheck_rejection_skips_the_sandbox(self):
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.post(
+            reverse('problem_detail', args=[self.problem.pk]), {'code': 'print(\n'})
+        submission = await Submission.objects.aget()
+        self.assertFalse(submission.passed)
+        self.assertTrue(submission.output.startswith(f'[{results.VERDICT_COMPILE_ERROR}]'))
+        self.assertEqual(await submission.atest_results(), [])
+
+    async def test_invalid_form_rerenders(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse('problem_detail', args=[self.problem.pk]), {'code': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(await Submission.objects.aexists())
+
+    async def test_progress_and_leaderboard(self):
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.post(reverse('problem_detail', args=[self.problem.pk]), {'code': ADD})
+        response = await self.async_client.get(reverse('my_progress'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.passed for p in response.context['problems']], [True])
+
+        response = await self.async_client.get(reverse('leaderboard'))
+        self.assertEqual(response.status_code, 200)
+        leader, = response.context['leaders']
+        self.assertEqual((leader['username'], leader['completed'], leader['percent']), ('alice', 1, 100.0))
@@ -14,6 +14,7 @@ urlpatterns = [
     path('', views.problem_list, name='problem_list'),
     path('problems/<int:pk>/', views.problem_detail, name='problem_detail'),
     path('submission/<int:pk>/', views.submission_detail, name='submission_detail'),
+    path('submission/<int:pk>/profile/', views.request_profile, name='request_profile'),
     path('progress/', views.my_progress, name='my_progress'),
     path('leaderboard/', views.leaderboard, name='leaderboard'),
 ]
\ No newline at end of file
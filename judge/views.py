@@ -1,45 +1,45 @@
 from __future__ import annotations
 from django.utils import timezone
-import tempfile,subprocess, os
+import os
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
-from django.shortcuts import get_object_or_404, redirect, render  # type: ignore
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import redirect, render  # type: ignore
 
 from django.contrib.auth.decorators import login_required
 from django.db.models import Exists, OuterRef
 from .models import Problem, Submission, TestCase, Solution
-from .models import UserProblemStat 
-from django.contrib.auth import get_user_model
-from django.db.models import Count, Q, F, Sum, IntegerField
+from .models import SubmissionProfile, UserProblemStat
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, IntegerField
+from . import precheck, profiling, results, runners
 from .forms import SubmissionForm
+from .sandbox import KILLED_CPU, KILLED_WALL
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login as auth_login
 from django.urls import reverse
 from django.db.models.functions import Coalesce
 
 
-def leaderboard(request):
-    total_problems = Problem.objects.count()
-    User = get_user_model()
-    qs = (
-        User.objects
-        .annotate(
-            completed=Count(
-                'submissions__problem',
-                filter=Q(submissions__passed=True),
-                distinct=True,
-            )
-        )
-        .annotate(
-            percent_completed=100.0 * F('completed') / (total_problems or 1)
-        )
-        .order_by('-percent_completed', 'username')
-    )
-    return render(request, 'judge/leaderboard.html', {
-        'leaders': qs,
-        'total_problems': total_problems
-    })
+async def _arender(request, template_name: str, context: dict):
+    """Render a template from an async view.
+
+    ``request.user`` is a lazy object that would hit the database from
+    inside the template (via the auth context processor), which is not
+    allowed in an async context.  Resolve it asynchronously first.
+    """
+    request.user = await request.auser()
+    return render(request, template_name, context)
+
+
+async def _aget_or_404(queryset, **lookup):
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
 
 def signup(request):
     if request.method == 'POST':
@@ -53,8 +53,8 @@ def signup(request):
     return render(request, 'registration/signup.html', {'form': form})
 
 @login_required
-def my_progress(request):
-    user = request.user
+async def my_progress(request):
+    user = await request.auser()
     passed_sub_qs = Submission.objects.filter(
         user=user,
         problem=OuterRef('pk'),
@@ -63,139 +63,216 @@ def my_progress(request):
     problems = Problem.objects.all().annotate(
         passed=Exists(passed_sub_qs)
     )
-    # Optionally: count attempts per problem for this user
-    attempts_qs = Submission.objects.filter(user=user, problem=OuterRef('pk'))
-    problems = problems.annotate(
-        # latest attempt time or count if you want
-    )
-    return render(request, 'judge/my_progress.html', {'problems': problems})
+    problems = [p async for p in problems]
+    return await _arender(request, 'judge/my_progress.html', {'problems': problems})
 
-def problem_list(request):
+async def problem_list(request):
     """Render a list of all problems."""
-    problems = Problem.objects.all()
-    return render(request, 'judge/problem_list.html', {'problems': problems})
+    problems = [p async for p in Problem.objects.all()]
+    return await _arender(request, 'judge/problem_list.html', {'problems': problems})
+
+
+def judge_code(code: str, test_cases: List[TestCase], problem: Problem | None = None) -> Tuple[bool, List[Dict[str, object]], List[str]]:
+    """Run ``code`` against ``test_cases`` in the sandbox.
+
+    The runtime and time limits come from ``problem`` (CPython with the
+    default limits when omitted); interactive problems are judged by the
+    problem's interactor instead of comparing output.
+
+    Returns ``(all_passed, per_test_rows, combined_output_lines)``; the
+    rows are ready for :func:`judge.results.encode`.
+    This is blocking; async callers should run it in a worker thread.
+    """
+    per_results: List[Dict[str, object]] = []
+    all_passed = True
+    combined_lines: List[str] = []
+    runner = runners.runner_for(problem)
+    limits = runner.limits(problem)
+    interactive = bool(problem is not None and problem.interactor.strip())
+    tmp_path: Path | None = None
+
+    try:
+        # Write submitted code to a temp file
+        tmp_path = runners.write_source(code, runner)
+
+        for idx, case in enumerate(test_cases, start=1):
+            if interactive:
+                outcome = runners.run_interactive(runner, tmp_path, problem.interactor, case.input_data, limits)
+                result = outcome.result
+                actual = outcome.message
+                passed = result.killed_by is None and result.returncode == 0 and outcome.accepted
+            else:
+                result = runner.run(tmp_path, case.input_data, limits)
+                actual = (result.stdout or '').strip()
+                expected = (case.expected_output or '').strip()
+                passed = (
+                    result.killed_by is None
+                    and result.returncode == 0
+                    and actual == expected
+                )
 
+            if passed:
+                verdict = results.VERDICT_ACCEPTED
+            elif result.killed_by is not None:
+                verdict = results.KILL_VERDICTS[result.killed_by]
+            elif result.returncode != 0:
+                verdict = results.VERDICT_RUNTIME_ERROR
+            else:
+                verdict = results.VERDICT_WRONG_ANSWER
+
+            per_results.append({
+                'case_id': case.pk,
+                'verdict': verdict,
+                'actual': actual,
+                'stderr': result.kill_message or (result.stderr or '').strip(),
+                'returncode': None if result.killed_by else result.returncode,
+                'time': result.cpu_time,
+                'memory': result.memory,
+            })
+
+            if result.killed_by in (KILLED_CPU, KILLED_WALL):
+                combined_lines.append(f'#{idx} -> [TLE]')
+            elif result.killed_by is not None:
+                combined_lines.append(f'#{idx} -> [{result.killed_by.upper()}]')
+            else:
+                combined_lines.append(f'#{idx} -> {actual}')
+            if not passed:
+                all_passed = False
+
+    finally:
+        if tmp_path is not None:
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except Exception:
+                pass
+
+    return all_passed, per_results, combined_lines
+
+
+def record_submission(user, problem: Problem, code: str, all_passed: bool,
+                      combined_lines: List[str], per_results: List[Dict[str, object]],
+                      error: str = '') -> Submission:
+    """Store a judged submission and update the user's solution and stats.
+
+    All writes happen in one short transaction, and the attempt counter
+    is incremented in SQL so concurrent submissions do not lose counts.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Create the submission with per-test breakdown
+        submission = Submission.objects.create(
+            problem=problem,
+            code=code,
+            passed=all_passed,
+            output='\n'.join(combined_lines),
+            error=error,
+            per_test_results=results.encode(per_results),
+            user=user,
+        )
 
-def problem_detail(request, pk: int):
+        if all_passed:
+            Solution.objects.update_or_create(
+                user=user,
+                problem=problem,
+                defaults={'submission': submission, 'code': code},
+            )
+
+        UserProblemStat.objects.get_or_create(
+            user=user, problem=problem,
+            defaults={'attempts': 0}
+        )
+        stats = UserProblemStat.objects.filter(user=user, problem=problem)
+        stats.update(attempts=F('attempts') + 1, last_submission_at=now)
+        if all_passed:
+            stats.filter(passed=False).update(passed=True, first_accepted_at=now)
+    return submission
+
+
+async def problem_detail(request, pk: int):
     """Display a single problem and handle code submissions."""
-    problem = get_object_or_404(Problem, pk=pk)
+    problem = await _aget_or_404(Problem.objects.all(), pk=pk)
 
     if request.method == 'POST':
-        if not request.user.is_authenticated:
+        user = await request.auser()
+        if not user.is_authenticated:
             return redirect(f"{reverse('login')}?next={request.path}")
 
         form = SubmissionForm(request.POST)
         if form.is_valid():
             code = form.cleaned_data['code']
 
-            per_results: List[Dict[str, object]] = []
-            all_passed = True
-            combined_lines: List[str] = []
-            tmp_path: Path | None = None
-
-            try:
-                # Write submitted code to a temp file
-                with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as tmp:
-                    tmp.write(code)
-                    tmp_path = Path(tmp.name)
-
-                # Evaluate against each test case (ordered for stable numbering)
-                for idx, case in enumerate(problem.test_cases.all().order_by('id'), start=1):
-                    try:
-                        result = subprocess.run(
-                            ['python3', str(tmp_path)],
-                            input=case.input_data,
-                            capture_output=True,
-                            text=True,
-                            timeout=5,
-                        )
-                        actual = (result.stdout or '').strip()
-                        expected = (case.expected_output or '').strip()
-                        passed = (actual == expected) and result.returncode == 0
-
-                        per_results.append({
-                            'index': idx,
-                            'input': case.input_data,
-                            'expected': expected,
-                            'actual': actual,
-                            'passed': passed,
-                            'stderr': (result.stderr or '').strip(),
-                            'returncode': result.returncode,
-                        })
-
-                        combined_lines.append(f'#{idx} -> {actual}')
-                        if not passed:
-                            all_passed = False
-
-                    except subprocess.TimeoutExpired:
-                        per_results.append({
-                            'index': idx,
-                            'input': case.input_data,
-                            'expected': (case.expected_output or '').strip(),
-                            'actual': '',
-                            'passed': False,
-                            'stderr': 'Time limit exceeded',
-                            'returncode': None,
-                        })
-                        combined_lines.append(f'#{idx} -> [TLE]')
-                        all_passed = False
-
-            finally:
-                if tmp_path is not None:
-                    try:
-                        tmp_path.unlink(missing_ok=True)
-                    except Exception:
-                        pass
-
-            # Create the submission with per-test breakdown
-            submission = Submission.objects.create(
-                problem=problem,
-                code=code,
-                passed=all_passed,
-                output='\n'.join(combined_lines),
-                per_test_results=per_results,
-                user=request.user,
+            # Evaluate against each test case (ordered for stable numbering).
+            test_cases = [c async for c in problem.test_cases.all().order_by('id')]
+
+            # Cheap static checks first; only launch the sandbox if they pass.
+            rejection = await sync_to_async(
+                precheck.run_prechecks, thread_sensitive=False,
+            )(code, problem, test_cases)
+            if rejection is not None:
+                verdict, message = rejection
+                all_passed, per_results = False, []
+                combined_lines = [f'[{verdict}] {message}']
+                error = message
+            else:
+                # The sandbox blocks on child processes, so run it off the event
+                # loop; thread_sensitive=False lets several judges run at once.
+                all_passed, per_results, combined_lines = await sync_to_async(
+                    judge_code, thread_sensitive=False,
+                )(code, test_cases, problem)
+                error = ''
+
+            submission = await sync_to_async(record_submission)(
+                user, problem, code, all_passed, combined_lines, per_results, error,
             )
 
-            if all_passed and request.user.is_authenticated:
-                Solution.objects.update_or_create(
-                    user=request.user,
-                    problem=problem,
-                    defaults={'submission': submission, 'code': code},
-                )
-            
-
-            if request.user.is_authenticated:
-                stat, _ = UserProblemStat.objects.get_or_create(
-                    user=request.user, problem=problem,
-                    defaults={'attempts': 0}
-                )
-                stat.attempts = (stat.attempts or 0) + 1
-                if all_passed and not stat.passed:
-                    stat.passed = True
-                    stat.first_accepted_at = timezone.now()
-                stat.last_submission_at = timezone.now()
-                stat.save()
-
             return redirect('submission_detail', pk=submission.pk)
 
         # Invalid form: fall through to re-render with errors
-        return render(request, 'judge/problem_detail.html', {'problem': problem, 'form': form})
+        return await _arender(request, 'judge/problem_detail.html', {'problem': problem, 'form': form})
 
     # GET request → render blank form
     form = SubmissionForm()
-    return render(request, 'judge/problem_detail.html', {'problem': problem, 'form': form})
+    return await _arender(request, 'judge/problem_detail.html', {'problem': problem, 'form': form})
 
 
-def submission_detail(request, pk: int):
+async def submission_detail(request, pk: int):
     """Show the results of a submission."""
-    submission = get_object_or_404(Submission, pk=pk)
-    return render(request, 'judge/submission_detail.html', {'submission': submission})
-
+    submission = await _aget_or_404(
+        Submission.objects.select_related('problem', 'user'), pk=pk,
+    )
+    profile = await SubmissionProfile.objects.filter(submission=submission).afirst()
+    user = await request.auser()
+    return await _arender(request, 'judge/submission_detail.html', {
+        'submission': submission,
+        'results': await submission.atest_results(),
+        'profile': profile,
+        'profile_report': profiling.annotate(profile.data, submission.code) if profile else None,
+        'can_profile': (
+            profile is None
+            and profiling.is_profilable(submission)
+            and user.is_authenticated
+            and submission.user_id == user.pk
+        ),
+    })
 
 
-def leaderboard(request):
-    total = Problem.objects.count()
+@login_required
+async def request_profile(request, pk: int):
+    """Queue a profiling run of the submission on its first failing test."""
+    if request.method != 'POST':
+        return redirect('submission_detail', pk=pk)
+    user = await request.auser()
+    submission = await _aget_or_404(Submission.objects.select_related('problem'), pk=pk, user=user)
+    if profiling.is_profilable(submission):
+        profile, created = await SubmissionProfile.objects.aget_or_create(submission=submission)
+        if created:
+            # Runs on a background thread; the page shows "pending" until done.
+            profiling.schedule(profile.pk)
+    return redirect('submission_detail', pk=pk)
+
+
+async def leaderboard(request):
+    total = await Problem.objects.acount()
 
     rows = (
         UserProblemStat.objects
@@ -208,7 +285,7 @@ def leaderboard(request):
 
     # Compute percent in Python and sort
     data = []
-    for r in rows:
+    async for r in rows:
         percent = (r['completed'] * 100.0 / total) if total else 0.0
         data.append({
             'user_id': r['user_id'],
@@ -221,7 +298,7 @@ def leaderboard(request):
     # Sort: highest % first, then fewer attempts, then username
     data.sort(key=lambda d: (-d['percent'], d['attempts'], d['username'].lower()))
 
-    return render(request, 'judge/leaderboard.html', {
+    return await _arender(request, 'judge/leaderboard.html', {
         'leaders': data,
         'total_problems': total,
-    })
\ No newline at end of file
+    })